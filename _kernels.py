@@ -0,0 +1,56 @@
+# _kernels.py
+from __future__ import annotations
+
+from typing import List, Sequence
+
+# Optional numeric kernels for long history replays (abcd_runner.py --backtest).
+#
+# Imported lazily: the daily run checks one draw against a handful of games and the
+# plain int.bit_count() loop is faster than paying numba's JIT compile there.
+# Fallback chain: numba -> numpy (>= 2.0 bitwise_count) -> pure Python.
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+if np is not None and njit is not None:
+    @njit(cache=True, fastmath=False)
+    def _hits_matrix_nb(games, draws):
+        out = np.empty((draws.shape[0], games.shape[0]), dtype=np.uint8)
+        for i in range(draws.shape[0]):
+            d = draws[i]
+            for j in range(games.shape[0]):
+                x = games[j] & d
+                c = 0
+                while x:
+                    x &= x - np.uint32(1)
+                    c += 1
+                out[i, j] = c
+        return out
+else:
+    _hits_matrix_nb = None
+
+
+def hits_matrix(games: Sequence[int], draws: Sequence[int]) -> List[List[int]]:
+    """
+    popcount(games[j] & draws[i]) for every (draw, game) pair.
+    games/draws are bitmasks (dezenas in bits 1..25). Returns len(draws) rows of
+    len(games) hits each.
+    """
+    if np is None:
+        return [[(g & d).bit_count() for g in games] for d in draws]
+
+    g = np.fromiter((m & 0xFFFFFFFF for m in games), dtype=np.uint32, count=len(games))
+    d = np.fromiter((m & 0xFFFFFFFF for m in draws), dtype=np.uint32, count=len(draws))
+    if _hits_matrix_nb is not None:
+        return _hits_matrix_nb(g, d).tolist()
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(d[:, None] & g[None, :]).tolist()
+    return [[(gm & dm).bit_count() for gm in games] for dm in draws]
@@ -2,18 +2,39 @@
 from __future__ import annotations
 
 import argparse
+import functools
+import importlib
+import io
+import itertools
 import json
+import os
+import pickle
 import re
 import subprocess
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from datetime import datetime, date
+from datetime import datetime, date, timezone
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple
-from datetime import datetime, date
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 from zoneinfo import ZoneInfo
 import shutil
 from openpyxl import load_workbook
 
+try:
+    import orjson  # opcional: JSON em C, bem mais rápido com indent
+except ImportError:
+    orjson = None
+
+try:
+    from python_calamine import CalamineWorkbook  # opcional: leitor XLSX em Rust, bem mais rápido
+except ImportError:
+    CalamineWorkbook = None
+
+try:
+    import numpy as np  # opcional: popcount vetorizado quando há muitas campanhas
+except ImportError:
+    np = None
+
 # This runner delegates ALL ABCD logic (including gate calculation) to the main script,
 # and only:
 # - writes a daily snapshot into docs/results/YYYY/MM/YYYY-MM-DD.json
@@ -31,133 +52,254 @@ STATE_PATH = STATE_DIR / "abcd_campaigns.json"
 
 EMAIL_BODY_PATH = Path("email_body.txt")
 
+# local, disposable caches (not published: kept out of docs/ and git)
+CACHE_DIR = Path(".abcd_cache")
+DRAWS_CACHE_PATH = CACHE_DIR / "draws_cache.pkl"
+GATE_CACHE_PATH = CACHE_DIR / "abcd_gate_cache.json"
+
 # -------- XLSX parsing (CAIXA download format) --------
 
+_DATE_RE = re.compile(r"^(\d{2})/(\d{2})/(\d{4})$")
+_SPLIT_RE = re.compile(r"[,\s]+")  # separators in stored game strings ("01,02 03")
+_XLSX_NAME_RE = re.compile(r"^resultados_(\d{2})(\d{2})(\d{4})\.xlsx$")
+
+# Accepted (normalized) header names for Bola1..Bola15, in priority order.
+# Real file uses "Bola1"..."Bola15" (no space) -> normalized becomes "bola1".
+BALL_PATTERNS: Tuple[Tuple[str, ...], ...] = tuple(
+    (
+        f"bola{i}",
+        f"bola {i}",
+        f"bolas {i}",
+        f"dezena{i}",
+        f"dezena {i}",
+        f"{i}ª dezena",
+        f"b{i}",
+        f"b {i}",
+    )
+    for i in range(1, 16)
+)
+
 def _norm_header(s: str) -> str:
-    s = (s or "").strip().lower()
-    s = re.sub(r"\s+", " ", s)
-    return s
+    # lower + collapse/strip whitespace (str.split() does both, no regex)
+    return " ".join((s or "").lower().split())
 
-def _find_header_row(ws) -> Tuple[int, Dict[str, int]]:
+def _find_header_row(rows: Iterator[Sequence]) -> Tuple[int, int, int, Tuple[int, ...]]:
     """
     Finds a header row that contains 'Concurso' and 15 ball columns.
-    Returns (row_index_1based, col_map) where col_map keys:
-      concurso, data, b1..b15
+    Returns (row_index_1based, concurso_idx, data_idx_or_-1, ball_idx_tuple),
+    with 0-based indices into the row sequences of `rows`. ball_idx_tuple
+    follows Bola1..Bola15. Consumes `rows` only up to the header (at most 50
+    rows), so the caller keeps iterating the same iterator for the data.
     """
-    for r in range(1, 51):
-        row = [ws.cell(row=r, column=c).value for c in range(1, 60)]
-        norm = [_norm_header(str(v)) if v is not None else "" for v in row]
-
-        try:
-            c_conc = norm.index("concurso") + 1
-        except ValueError:
+    for r, row in enumerate(itertools.islice(rows, 50), start=1):
+        # token -> first column index where it appears
+        norm_idx: Dict[str, int] = {}
+        for idx, v in enumerate(row):
+            if v is not None:
+                norm_idx.setdefault(_norm_header(str(v)), idx)
+
+        c_conc = norm_idx.get("concurso")
+        if c_conc is None:
             continue
 
-        c_date = None
+        c_date = -1
         for cand in ("data sorteio", "data"):
-            if cand in norm:
-                c_date = norm.index(cand) + 1
+            if cand in norm_idx:
+                c_date = norm_idx[cand]
                 break
 
-        ball_cols: Dict[str, int] = {}
-        for i in range(1, 16):
-            # real file uses "Bola1"..."Bola15" (no space) -> normalized becomes "bola1"
-            patterns = [
-                f"bola{i}",
-                f"bola {i}",
-                f"bolas {i}",
-                f"dezena{i}",
-                f"dezena {i}",
-                f"{i}ª dezena",
-                f"b{i}",
-                f"b {i}",
-            ]
+        ball_cols: List[int] = []
+        for patterns in BALL_PATTERNS:
             found = None
             for p in patterns:
-                if p in norm:
-                    found = norm.index(p) + 1
+                if p in norm_idx:
+                    found = norm_idx[p]
                     break
             if found is None:
-                ball_cols = {}
+                ball_cols = []
                 break
-            ball_cols[f"b{i}"] = found
+            ball_cols.append(found)
 
         if ball_cols:
-            col_map = {"concurso": c_conc}
-            if c_date:
-                col_map["data"] = c_date
-            col_map.update(ball_cols)
-            return r, col_map
+            return r, c_conc, c_date, tuple(ball_cols)
 
     raise RuntimeError("Não consegui localizar o header do XLSX (Concurso/Bola1..Bola15).")
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Draw:
     concurso: int
     data: Optional[str]
-    nums: Set[int]
+    nums: int  # bitmask: bit n set <=> dezena n sorteada
 
-def load_draws_from_xlsx(xlsx_path: str, sheet_name: str = "LOTOFÁCIL") -> List[Draw]:
-    wb = load_workbook(xlsx_path, data_only=True)
-    ws = wb[sheet_name] if sheet_name in wb.sheetnames else wb[wb.sheetnames[0]]
+def _xlsx_cache_key(xlsx_path: str, sheet_name: str) -> str:
+    st = os.stat(xlsx_path)
+    return f"{Path(xlsx_path).resolve()}|{sheet_name}|{st.st_mtime_ns}-{st.st_size}"
 
-    header_row, cols = _find_header_row(ws)
+def load_draws_from_xlsx(xlsx_path: str, sheet_name: str = "LOTOFÁCIL") -> List[Draw]:
+    """
+    Parsed draws of the XLSX. Reruns reuse the pickle in DRAWS_CACHE_PATH while
+    the file is unchanged (path + mtime + size); any miss/error re-parses.
+    """
+    key = _xlsx_cache_key(xlsx_path, sheet_name)
+    try:
+        with DRAWS_CACHE_PATH.open("rb") as f:
+            cached = pickle.load(f)
+        if cached.get("key") == key:
+            return cached["draws"]
+    except Exception:
+        pass
+
+    draws = _parse_draws_xlsx(xlsx_path, sheet_name)
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with DRAWS_CACHE_PATH.open("wb") as f:
+            pickle.dump({"key": key, "draws": draws}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass
+    return draws
 
-    draws: List[Draw] = []
-    r = header_row + 1
-    while True:
-        v_conc = ws.cell(row=r, column=cols["concurso"]).value
-        if v_conc is None:
-            break
+def _iter_sheet_rows(xlsx_path: str, sheet_name: str) -> Iterator[Sequence]:
+    """
+    Yields the cell values of each row of the sheet (falls back to the first
+    sheet). Uses python-calamine when installed, else openpyxl in read_only mode.
+    """
+    if CalamineWorkbook is not None:
+        # calamine: rows are lists of native values (numbers as float, "" for blanks)
+        wb = CalamineWorkbook.from_path(xlsx_path)
         try:
-            concurso = int(v_conc)
-        except Exception:
-            r += 1
-            continue
-
-        dval = ws.cell(row=r, column=cols.get("data", cols["concurso"] + 1)).value if "data" in cols else None
-        data_str = None
-        if isinstance(dval, datetime):
-            data_str = dval.date().isoformat()
-        elif isinstance(dval, date):
-            data_str = dval.isoformat()
-        elif isinstance(dval, str) and dval.strip():
-            s = dval.strip()
-            m = re.match(r"^(\d{2})/(\d{2})/(\d{4})$", s)
-            data_str = f"{m.group(3)}-{m.group(2)}-{m.group(1)}" if m else s
-
-        nums: Set[int] = set()
-        ok = True
-        for i in range(1, 16):
-            v = ws.cell(row=r, column=cols[f"b{i}"]).value
-            if v is None:
-                ok = False
-                break
+            names = wb.sheet_names
+            ws = wb.get_sheet_by_name(sheet_name if sheet_name in names else names[0])
+            yield from ws.iter_rows()
+        finally:
+            wb.close()
+        return
+
+    # read_only: openpyxl streams the sheet instead of building every cell object
+    wb = load_workbook(xlsx_path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name in wb.sheetnames else wb[wb.sheetnames[0]]
+        # max_col caps rows of sheets with bogus (huge) dimensions; max_row bounds the
+        # scan by the sheet dimension (blank rows from stray formatting are skipped)
+        yield from ws.iter_rows(max_row=ws.max_row, max_col=80, values_only=True)
+    finally:
+        wb.close()
+
+def _parse_draws_xlsx(xlsx_path: str, sheet_name: str) -> List[Draw]:
+    rows = _iter_sheet_rows(xlsx_path, sheet_name)
+    try:
+        _, ci, di, b = _find_header_row(rows)
+        width = max(ci, di, *b) + 1
+
+        draws: List[Draw] = []
+        for row in rows:
+            if len(row) < width:
+                row = tuple(row) + (None,) * (width - len(row))
+
+            v_conc = row[ci]
+            if v_conc is None:
+                continue
             try:
-                nums.add(int(v))
+                concurso = int(v_conc)
             except Exception:
-                ok = False
-                break
-
-        if ok and len(nums) == 15:
-            draws.append(Draw(concurso=concurso, data=data_str, nums=nums))
+                continue
+
+            dval = row[di] if di >= 0 else None
+            data_str = None
+            if dval is None:
+                pass
+            elif isinstance(dval, datetime):
+                data_str = dval.date().isoformat()
+            elif isinstance(dval, date):
+                data_str = dval.isoformat()
+            elif isinstance(dval, str) and dval.strip():
+                # only text cells need the regex ("dd/mm/yyyy" in the CAIXA sheet)
+                s = dval.strip()
+                m = _DATE_RE.match(s)
+                data_str = f"{m.group(3)}-{m.group(2)}-{m.group(1)}" if m else s
+
+            nums = 0
+            ok = True
+            for c in b:
+                v = row[c]
+                if v is None:
+                    ok = False
+                    break
+                try:
+                    nums |= 1 << int(v)
+                except Exception:
+                    ok = False
+                    break
 
-        r += 1
+            if ok and nums.bit_count() == 15:
+                draws.append(Draw(concurso=concurso, data=data_str, nums=nums))
+    finally:
+        rows.close()
 
     draws.sort(key=lambda d: d.concurso)
     return draws
 
 # -------- campaigns state --------
 
+# JSON parse from bytes (orjson when available; stdlib json also accepts UTF-8 bytes)
+_loads = orjson.loads if orjson is not None else json.loads
+
+def _write_json(path: Path, obj) -> None:
+    """
+    Indented UTF-8 JSON file. orjson (C) when available; otherwise stdlib json.dump
+    streams into the file handle instead of building the whole string first.
+    Written to a sibling .tmp and os.replace()d, so a crash never leaves a truncated file.
+    """
+    tmp = path.with_name(path.name + ".tmp")
+    if orjson is not None:
+        tmp.write_bytes(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(obj, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
 def load_state() -> Dict:
     if not STATE_PATH.exists():
         return {"version": 1, "updated_at": None, "campaigns": []}
-    return json.loads(STATE_PATH.read_text(encoding="utf-8"))
+    return _loads(STATE_PATH.read_bytes())
+
+def _strip_runtime_keys(camp: Dict) -> Dict:
+    # keys starting with "_" are in-memory caches (e.g. _parsed_jogos), never persisted
+    return {k: v for k, v in camp.items() if not k.startswith("_")}
 
-def save_state(state: Dict) -> None:
+def save_state(state: Dict, now: Optional[datetime] = None) -> None:
     STATE_DIR.mkdir(parents=True, exist_ok=True)
-    state["updated_at"] = datetime.utcnow().isoformat(timespec="seconds") + "Z"
-    STATE_PATH.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+    now = now or datetime.now(timezone.utc)
+    state["updated_at"] = now.strftime("%Y-%m-%dT%H:%M:%SZ")
+    out = dict(state)
+    out["campaigns"] = [_strip_runtime_keys(c) for c in (state.get("campaigns", []) or [])]
+    _write_json(STATE_PATH, out)
+
+def _state_fingerprint(state: Dict) -> int:
+    """Hash of what save_state persists, minus updated_at (tells a no-op run apart)."""
+    body = {k: v for k, v in state.items() if k != "updated_at"}
+    body["campaigns"] = [_strip_runtime_keys(c) for c in (state.get("campaigns", []) or [])]
+    if orjson is not None:
+        return hash(orjson.dumps(body, option=orjson.OPT_SORT_KEYS))
+    return hash(json.dumps(body, sort_keys=True))
+
+_CAMPAIGN_INT_FIELDS = ("start_concurso", "target_start_concurso", "teimosinha_n", "min_hits_stop")
+
+def _normalize_campaigns(campaigns: List[Dict]) -> None:
+    """
+    Casts the numeric campaign fields once at load (state may hold them as strings)
+    and precomputes the check window: _start/_n/_end (target concursos) and _min_hits.
+    Underscore keys are runtime-only (stripped by save_state).
+    """
+    for c in campaigns:
+        for k in _CAMPAIGN_INT_FIELDS:
+            if c.get(k) is not None:
+                c[k] = int(c[k])
+        if c.get("target_start_concurso") is not None and c.get("teimosinha_n") is not None:
+            c["_start"] = c["target_start_concurso"]
+            c["_n"] = c["teimosinha_n"]
+            c["_end"] = c["_start"] + c["_n"] - 1
+        if c.get("min_hits_stop") is not None:
+            c["_min_hits"] = c["min_hits_stop"]
 
 def campaign_key(start_concurso: int, created_on: str) -> str:
     return f"c_{start_concurso}_{created_on.replace('-','')}"
@@ -171,7 +313,7 @@ def ensure_snapshot_dirs(ymd: str) -> Path:
 def write_daily_snapshot(sig: Dict, ymd: str) -> Path:
     outdir = ensure_snapshot_dirs(ymd)
     outpath = outdir / f"{ymd}.json"
-    outpath.write_text(json.dumps(sig, ensure_ascii=False, indent=2), encoding="utf-8")
+    _write_json(outpath, sig)
     return outpath
 
 def parse_args() -> argparse.Namespace:
@@ -182,9 +324,26 @@ def parse_args() -> argparse.Namespace:
     ap.add_argument("--script", type=str, default=SCRIPT)
     ap.add_argument("--xlsx", type=str, default="", help="Opcional: path fixo do XLSX (senão usa auto do script).")
     ap.add_argument("--force_email", action="store_true", help="Força gerar email_body.txt mesmo se gate_pass=False e sem campanhas.")
+    ap.add_argument("--verbose_checks", action="store_true", help="Grava também os hits de cada jogo (per_game) em cada check da campanha.")
+    ap.add_argument("--backtest", action="store_true", help="Também confere os jogos do sinal de hoje contra todo o histórico do XLSX (só relatório).")
     return ap.parse_args()
 
-def run_daily_signal(script: str, teimosinha: int, min_hits_stop: int, gate_percentis: str) -> Dict:
+def _import_signal_module(script: str):
+    """
+    Imports the main script as a module (same dir as this runner) so the daily signal
+    runs in-process (no second interpreter / re-import of openpyxl).
+    Returns None when it can't be used -> caller falls back to the subprocess path.
+    """
+    try:
+        mod = importlib.import_module(Path(script).stem)
+        mod.daily_signal, mod.ensure_results_file
+    except (ImportError, AttributeError) as e:
+        # e.g. --script pointing to an older version without daily_signal()
+        print(f"[WARN] import de {script} falhou ({e}); usando subprocess.")
+        return None
+    return mod
+
+def _run_daily_signal_subprocess(script: str, teimosinha: int, min_hits_stop: int, gate_percentis: str) -> Dict:
     cmd = [
         "python", script,
         "--abcd_daily_signal",
@@ -194,65 +353,145 @@ def run_daily_signal(script: str, teimosinha: int, min_hits_stop: int, gate_perc
         "--abcd_daily_json", "abcd_signal.json",
     ]
     subprocess.check_call(cmd)
-    return json.loads(Path("abcd_signal.json").read_text(encoding="utf-8"))
+    return _loads(Path("abcd_signal.json").read_bytes())
 
-def find_latest_xlsx() -> Optional[str]:
-    files = sorted(Path(".").glob("resultados_*.xlsx"), key=lambda p: p.stat().st_mtime, reverse=True)
-    return str(files[0]) if files else None
+def _xlsx_name_key(p: Path) -> Tuple[Tuple[int, int, int], str]:
+    # resultados_DDMMYYYY.xlsx -> (yyyy, mm, dd); other names sort before any dated file
+    m = _XLSX_NAME_RE.match(p.name)
+    ymd = (int(m.group(3)), int(m.group(2)), int(m.group(1))) if m else (0, 0, 0)
+    return ymd, p.name
 
-def parse_game_nums(s: str) -> Set[int]:
-    nums: Set[int] = set()
-    for tok in re.split(r"[,\s]+", (s or "").strip()):
+@functools.lru_cache(maxsize=1)
+def find_latest_xlsx() -> Optional[str]:
+    # newest by the date embedded in the file name (no stat() per file)
+    latest = max(Path(".").glob("resultados_*.xlsx"), key=_xlsx_name_key, default=None)
+    return str(latest) if latest else None
+
+def parse_game_nums(s: str) -> int:
+    """Parses "01,02 03..." into a bitmask (same layout as Draw.nums)."""
+    nums = 0
+    for tok in _SPLIT_RE.split((s or "").strip()):
         if not tok:
             continue
         try:
-            nums.add(int(tok))
+            nums |= 1 << int(tok)
         except Exception:
             pass
     return nums
 
-def compute_hits(game: Set[int], draw_nums: Set[int]) -> int:
-    return len(game.intersection(draw_nums))
+def compute_hits(game_mask: int, draw_mask: int) -> int:
+    return (game_mask & draw_mask).bit_count()
 
-def check_campaign_against_draw(camp: Dict, draw: Draw) -> Dict:
-    jogos = camp.get("jogos", {}) or {}
-    parsed_games: List[Tuple[str, Set[int]]] = [(str(k), parse_game_nums(str(v))) for k, v in jogos.items()]
+def campaign_parsed_jogos(camp: Dict) -> List[Tuple[str, int]]:
+    """
+    (game_key, mask) for each game of the campaign. The jogos never change after
+    the campaign is opened, so the parse is cached in camp["_parsed_jogos"].
+    """
+    parsed = camp.get("_parsed_jogos")
+    if parsed is None:
+        jogos = camp.get("jogos", {}) or {}
+        parsed = [(str(k), parse_game_nums(str(v))) for k, v in jogos.items()]
+        camp["_parsed_jogos"] = parsed
+    return parsed
+
+# below this many games the plain int.bit_count() loop beats numpy's call overhead
+BATCH_HITS_NUMPY_MIN = 64
+
+def batch_hits(game_masks: List[int], draw_mask: int) -> List[int]:
+    """compute_hits() for many game masks at once (numpy >= 2.0 popcount when worth it)."""
+    if np is not None and hasattr(np, "bitwise_count") and len(game_masks) >= BATCH_HITS_NUMPY_MIN:
+        # dezenas live in bits 1..25; anything above bit 31 can never hit a draw
+        arr = np.fromiter((m & 0xFFFFFFFF for m in game_masks), dtype=np.uint32, count=len(game_masks))
+        return np.bitwise_count(arr & np.uint32(draw_mask)).tolist()
+    return [compute_hits(m, draw_mask) for m in game_masks]
+
+def batch_campaign_hits(camps: List[Dict], draw: Draw) -> Dict[int, List[int]]:
+    """
+    Hits of every game of every campaign in camps against one draw, computed in a
+    single batch. Returns {id(camp): [hits per game, in campaign_parsed_jogos order]}.
+    """
+    parsed = [campaign_parsed_jogos(c) for c in camps]
+    hits = batch_hits([m for games in parsed for _, m in games], draw.nums)
+    out: Dict[int, List[int]] = {}
+    pos = 0
+    for c, games in zip(camps, parsed):
+        out[id(c)] = hits[pos:pos + len(games)]
+        pos += len(games)
+    return out
+
+# per-game hits in every stored check grow abcd_campaigns.json by campaigns x days;
+# off by default, enabled with --verbose_checks
+STORE_PER_GAME = False
+
+def check_campaign_against_draw(
+    camp: Dict,
+    draw: Draw,
+    hits: Optional[List[int]] = None,
+    store_per_game: bool = STORE_PER_GAME,
+) -> Dict:
+    parsed_games = campaign_parsed_jogos(camp)
+    if hits is None:
+        hits = [compute_hits(gnums, draw.nums) for _, gnums in parsed_games]
 
     best_hits = -1
     best_key = None
     per_game = []
-    for k, gnums in parsed_games:
-        h = compute_hits(gnums, draw.nums)
-        per_game.append({"game": k, "hits": h})
+    for (k, _), h in zip(parsed_games, hits):
+        if store_per_game:
+            per_game.append({"game": k, "hits": h})
         if h > best_hits:
             best_hits = h
             best_key = k
+            if h == 15:
+                # nothing can beat 15 (campaign is won); remaining games are not listed
+                break
 
-    return {
+    chk = {
         "concurso": draw.concurso,
         "data": draw.data,
         "best_hits": best_hits,
         "best_game": best_key,
-        "per_game": per_game,
     }
+    if store_per_game:
+        chk["per_game"] = per_game
+    return chk
+
+def backtest_games(jogos: Dict, draws: List[Draw]) -> Dict[str, Dict[int, int]]:
+    """
+    Replays each game against every draw in history.
+    Returns {game_key: {hits: n_concursos}} for hits 11..15.
+    """
+    from _kernels import hits_matrix  # lazy: numba JIT only when --backtest is used
+
+    keys = [str(k) for k in (jogos or {})]
+    masks = [parse_game_nums(str(v)) for v in (jogos or {}).values()]
+    out: Dict[str, Dict[int, int]] = {k: {h: 0 for h in range(11, 16)} for k in keys}
+    for row in hits_matrix(masks, [d.nums for d in draws]):
+        for k, h in zip(keys, row):
+            if h >= 11:
+                out[k][h] += 1
+    return out
 
 def already_checked(camp: Dict, concurso: int) -> bool:
-    return any((chk.get("concurso") == concurso) for chk in (camp.get("checks", []) or []))
+    # set of checked concursos, cached in camp["_checked_set"] (not persisted)
+    checked = camp.get("_checked_set")
+    if checked is None:
+        checked = {chk.get("concurso") for chk in (camp.get("checks", []) or [])}
+        camp["_checked_set"] = checked
+    return concurso in checked
 
 def within_offset_window(camp: Dict, concurso: int) -> bool:
-    start = int(camp["target_start_concurso"])
-    n = int(camp["teimosinha_n"])
-    end = start + n - 1
-    return start <= concurso <= end
+    if "_end" not in camp:
+        _normalize_campaigns([camp])
+    return camp["_start"] <= concurso <= camp["_end"]
 
 def checks_done_in_window(camp: Dict) -> int:
     return len(camp.get("checks", []) or [])
 
-def _fmt_games_block(jogos: Dict) -> List[str]:
-    out = []
+def _fmt_games_block(w, jogos: Dict) -> None:
+    """Writes one "  key: nums" line per game through the writer w (e.g. StringIO.write)."""
     for k, v in (jogos or {}).items():
-        out.append(f"  {k}: {v}")
-    return out
+        w(f"  {k}: {v}\n")
 
 def build_email_digest(
     sig: Dict,
@@ -266,68 +505,70 @@ def build_email_digest(
 ) -> str:
     gate = sig.get("gate", {}) or {}
 
-    lines: List[str] = []
-    lines.append("Lotofácil ABCD — Resumo Diário")
-    lines.append("")
-    lines.append(f"Rodado em (Dublin 04:30+): {run_ymd}")
-    lines.append(f"Último concurso disponível: {latest_draw.concurso} | Data: {latest_draw.data}")
-    lines.append("")
-    lines.append(f"gate_pass (hoje): {sig.get('gate_pass')}")
-    lines.append(f"Percentis: {gate.get('percentis')} | Faixa: {gate.get('faixa')} | Gap atual: {gate.get('gap_atual')}")
-    lines.append("")
+    buf = io.StringIO()
+    w = buf.write
+    w("Lotofácil ABCD — Resumo Diário\n")
+    w("\n")
+    w(f"Rodado em (Dublin 04:30+): {run_ymd}\n")
+    w(f"Último concurso disponível: {latest_draw.concurso} | Data: {latest_draw.data}\n")
+    w("\n")
+    w(f"gate_pass (hoje): {sig.get('gate_pass')}\n")
+    w(f"Percentis: {gate.get('percentis')} | Faixa: {gate.get('faixa')} | Gap atual: {gate.get('gap_atual')}\n")
+    w("\n")
 
     # always show today's suggested games (from daily JSON)
-    lines.append("=== JOGOS DO SINAL DE HOJE (JSON) ===")
+    w("=== JOGOS DO SINAL DE HOJE (JSON) ===\n")
     jogos_hoje = sig.get("jogos", {}) or {}
     if jogos_hoje:
-        lines.extend(_fmt_games_block(jogos_hoje))
+        _fmt_games_block(w, jogos_hoje)
     else:
-        lines.append("  (nenhum jogo encontrado no JSON)")
-    lines.append("")
+        w("  (nenhum jogo encontrado no JSON)\n")
+    w("\n")
 
     if opened:
-        lines.append("=== NOVAS CAMPANHAS ABERTAS HOJE ===")
+        w("=== NOVAS CAMPANHAS ABERTAS HOJE ===\n")
         for c in opened:
-            lines.append(f"- {c['id']} | start={c['start_concurso']} -> alvo_início={c['target_start_concurso']} | teimosinha={c['teimosinha_n']} | stop_hits={c['min_hits_stop']}")
-            lines.append("  Jogos:")
-            lines.extend(_fmt_games_block(c.get("jogos", {}) or {}))
-        lines.append("")
+            w(f"- {c['id']} | start={c['start_concurso']} -> alvo_início={c['target_start_concurso']} | teimosinha={c['teimosinha_n']} | stop_hits={c['min_hits_stop']}\n")
+            w("  Jogos:\n")
+            _fmt_games_block(w, c.get("jogos", {}) or {})
+        w("\n")
 
     if won:
-        lines.append("=== CAMPANHAS ENCERRADAS (GANHOU >= stop_hits) ===")
+        w("=== CAMPANHAS ENCERRADAS (GANHOU >= stop_hits) ===\n")
         for c in won:
-            w = c.get("won", {}) or {}
-            lines.append(f"- {c['id']} | start={c['start_concurso']} | ganhou no concurso {w.get('when_concurso')} com {w.get('best_hits')} hits ({w.get('best_game')})")
-        lines.append("")
+            wn = c.get("won", {}) or {}
+            w(f"- {c['id']} | start={c['start_concurso']} | ganhou no concurso {wn.get('when_concurso')} com {wn.get('best_hits')} hits ({wn.get('best_game')})\n")
+        w("\n")
 
     if expired:
-        lines.append("=== CAMPANHAS ENCERRADAS (EXPIRADAS) ===")
+        w("=== CAMPANHAS ENCERRADAS (EXPIRADAS) ===\n")
         for c in expired:
-            lines.append(f"- {c['id']} | start={c['start_concurso']} | expirou após {c.get('teimosinha_n')} concursos")
-        lines.append("")
+            w(f"- {c['id']} | start={c['start_concurso']} | expirou após {c.get('teimosinha_n')} concursos\n")
+        w("\n")
 
     if updates:
-        lines.append("=== CHECKS DE HOJE (por campanha) ===")
+        w("=== CHECKS DE HOJE (por campanha) ===\n")
         for u in updates:
             chk = u["check"]
-            lines.append(f"- {u['id']} | concurso {chk['concurso']} | best_hits={chk['best_hits']} | best_game={chk['best_game']}")
-        lines.append("")
+            w(f"- {u['id']} | concurso {chk['concurso']} | best_hits={chk['best_hits']} | best_game={chk['best_game']}\n")
+        w("\n")
 
     if active:
-        lines.append("=== CAMPANHAS ATIVAS (LEMBRETE) ===")
+        w("=== CAMPANHAS ATIVAS (LEMBRETE) ===\n")
         for c in active:
             done = checks_done_in_window(c)
             total = int(c["teimosinha_n"])
             rem = max(0, total - done)
             last_chk = (c.get("checks", []) or [])[-1] if (c.get("checks") or []) else None
-            lines.append(f"- {c['id']} | start={c['start_concurso']} -> alvo={c['target_start_concurso']} | surpresinha {done}/{total} | remaining={rem}")
+            w(f"- {c['id']} | start={c['start_concurso']} -> alvo={c['target_start_concurso']} | surpresinha {done}/{total} | remaining={rem}\n")
             if last_chk:
-                lines.append(f"  último: concurso {last_chk.get('concurso')} | best_hits={last_chk.get('best_hits')} | best_game={last_chk.get('best_game')}")
-            lines.append("  Jogos:")
-            lines.extend(_fmt_games_block(c.get("jogos", {}) or {}))
-        lines.append("")
+                w(f"  último: concurso {last_chk.get('concurso')} | best_hits={last_chk.get('best_hits')} | best_game={last_chk.get('best_game')}\n")
+            w("  Jogos:\n")
+            _fmt_games_block(w, c.get("jogos", {}) or {})
+        w("\n")
 
-    return "\n".join(lines)
+    # every section ends with a blank line; drop the last "\n" (same text as the old "\n".join)
+    return buf.getvalue()[:-1]
 
 def main() -> int:
     args = parse_args()
@@ -338,26 +579,54 @@ def main() -> int:
     if not STATE_PATH.exists():
         save_state({"version": 1, "updated_at": None, "campaigns": []})
 
-    # Delegate signal+gate to your validated script
-    sig = run_daily_signal(args.script, args.teimosinha, args.min_hits_stop, args.gate_percentis)
+    # Delegate signal+gate to your validated script (abcd_signal.json is still written:
+    # workflow artifact).
+    sig_mod = _import_signal_module(args.script)
+    if sig_mod is not None:
+        # XLSX resolved (downloaded if needed) up front, so the runner's own parse runs in
+        # a worker process while the script computes the gate: wall time ~ max, not sum.
+        sig_xlsx = sig_mod.ensure_results_file(None)
+        xlsx = args.xlsx.strip() or sig_xlsx
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            draws_fut = pool.submit(load_draws_from_xlsx, xlsx)
+            sig = sig_mod.daily_signal(
+                args.teimosinha, args.min_hits_stop, args.gate_percentis, "abcd_signal.json",
+                resultados_xlsx=sig_xlsx, gate_cache=str(GATE_CACHE_PATH),
+            )
+            draws = draws_fut.result()
+    else:
+        sig = _run_daily_signal_subprocess(args.script, args.teimosinha, args.min_hits_stop, args.gate_percentis)
+        # Find XLSX saved by your script auto-download flow
+        xlsx = args.xlsx.strip() or find_latest_xlsx()
+        if not xlsx:
+            raise RuntimeError("Não encontrei resultados_*.xlsx no workspace após rodar o daily_signal.")
+        draws = load_draws_from_xlsx(xlsx)
 
     # Snapshot naming: use "today in Dublin run" date (UTC is fine for file partitioning),
     # but we keep the script's last_data for context.
-    run_ymd = datetime.utcnow().date().isoformat()
+    now = datetime.now(timezone.utc)
+    run_ymd = now.date().isoformat()
     snap_path = write_daily_snapshot(sig, run_ymd)
     print(f"Snapshot: {snap_path}")
-    # Find XLSX saved by your script auto-download flow
-    xlsx = args.xlsx.strip() or find_latest_xlsx()
-    if not xlsx:
-        raise RuntimeError("Não encontrei resultados_*.xlsx no workspace após rodar o daily_signal.")
 
-    draws = load_draws_from_xlsx(xlsx)
     if not draws:
         raise RuntimeError("Não consegui carregar concursos do XLSX.")
     latest = draws[-1]
 
+    if args.backtest:
+        bt = backtest_games(sig.get("jogos", {}) or {}, draws)
+        print(f"[BACKTEST] jogos de hoje vs {len(draws)} concursos:")
+        for k, dist in bt.items():
+            print(f"  {k}: " + " | ".join(f"{h}={n}" for h, n in dist.items()))
+
     state = load_state()
+    state_fp = _state_fingerprint(state)
     campaigns: List[Dict] = state.get("campaigns", []) or []
+    _normalize_campaigns(campaigns)
+
+    # dedupe index: start_concurso / target_start_concurso of every known campaign
+    starts = {c.get("start_concurso", -1) for c in campaigns}
+    targets = {c.get("target_start_concurso", -1) for c in campaigns}
 
     opened: List[Dict] = []
     won: List[Dict] = []
@@ -372,10 +641,7 @@ def main() -> int:
         cid = campaign_key(start_conc, created_on)
 
         # dedupe by start_concurso OR target_start_concurso
-        exists = any(
-            int(c.get("start_concurso", -1)) == start_conc or int(c.get("target_start_concurso", -1)) == target_start
-            for c in campaigns
-        )
+        exists = start_conc in starts or target_start in targets
 
         if not exists:
             new_c = {
@@ -390,18 +656,25 @@ def main() -> int:
                 "checks": [],
                 "won": {"when_concurso": None, "best_hits": None, "best_game": None},
             }
+            _normalize_campaigns([new_c])
             campaigns.append(new_c)
             opened.append(new_c)
 
     # B) Evaluate all active campaigns against latest concurso (offset window)
-    for c in campaigns:
-        if c.get("status") != "active":
-            continue
+    # (won/expired history is skipped up front)
+    active_list = [c for c in campaigns if c.get("status") == "active"]
+
+    # hits for every campaign that needs a check today, in one batch
+    to_check = [
+        c for c in active_list
+        if within_offset_window(c, latest.concurso)
+        and not already_checked(c, latest.concurso)
+    ]
+    hits_by_camp = batch_campaign_hits(to_check, latest)
 
+    for c in active_list:
         if not within_offset_window(c, latest.concurso):
-            start = int(c["target_start_concurso"])
-            end = start + int(c["teimosinha_n"]) - 1
-            if latest.concurso > end:
+            if latest.concurso > c["_end"]:
                 c["status"] = "expired"
                 expired.append(c)
             continue
@@ -409,11 +682,14 @@ def main() -> int:
         if already_checked(c, latest.concurso):
             continue
 
-        chk = check_campaign_against_draw(c, latest)
+        chk = check_campaign_against_draw(
+            c, latest, hits=hits_by_camp.get(id(c)), store_per_game=args.verbose_checks or STORE_PER_GAME
+        )
         c.setdefault("checks", []).append(chk)
+        c.setdefault("_checked_set", set()).add(chk["concurso"])
         updates.append({"id": c["id"], "check": chk})
 
-        if int(chk["best_hits"]) >= int(c["min_hits_stop"]):
+        if chk["best_hits"] >= c["_min_hits"]:
             c["status"] = "won"
             c["won"] = {
                 "when_concurso": chk["concurso"],
@@ -422,14 +698,19 @@ def main() -> int:
             }
             won.append(c)
         else:
-            if checks_done_in_window(c) >= int(c["teimosinha_n"]):
+            if checks_done_in_window(c) >= c["_n"]:
                 c["status"] = "expired"
                 expired.append(c)
 
     active = [c for c in campaigns if c.get("status") == "active"]
 
     state["campaigns"] = campaigns
-    save_state(state)
+    # no-op days leave the state file (and its updated_at) untouched: nothing to commit
+    state_dirty = bool(opened or updates or won or expired)
+    if state_dirty or _state_fingerprint(state) != state_fp:
+        save_state(state, now=now)
+    else:
+        print("[STATE] unchanged; skipping write")
 
     # Email policy:
     # - If gate_pass True -> always email (campaign opened)
@@ -453,23 +734,19 @@ def main() -> int:
     else:
         print("[EMAIL] will_send=false")
 
-    Path("runner_out.json").write_text(
-        json.dumps(
-            {
-                "run_ymd": run_ymd,
-                "last_concurso_json": sig.get("last_concurso"),
-                "latest_concurso_xlsx": latest.concurso,
-                "gate_pass": bool(sig.get("gate_pass")),
-                "email": should_email,
-                "opened": len(opened),
-                "active": len(active),
-                "won": len(won),
-                "expired": len(expired),
-            },
-            indent=2,
-            ensure_ascii=False,
-        ),
-        encoding="utf-8",
+    _write_json(
+        Path("runner_out.json"),
+        {
+            "run_ymd": run_ymd,
+            "last_concurso_json": sig.get("last_concurso"),
+            "latest_concurso_xlsx": latest.concurso,
+            "gate_pass": bool(sig.get("gate_pass")),
+            "email": should_email,
+            "opened": len(opened),
+            "active": len(active),
+            "won": len(won),
+            "expired": len(expired),
+        },
     )
     return 0
 
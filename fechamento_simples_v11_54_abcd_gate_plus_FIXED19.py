@@ -34,6 +34,7 @@ Observação importante:
 from __future__ import annotations
 
 import argparse
+import bisect
 import csv
 import json
 import os
@@ -41,6 +42,10 @@ import re
 import unicodedata
 import random
 import glob
+import functools
+import hashlib
+import heapq
+import itertools
 import statistics
 import math
 from dataclasses import dataclass
@@ -51,6 +56,16 @@ from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 from openpyxl import load_workbook
 from openpyxl.utils.datetime import from_excel
 
+try:
+    import numpy as np  # opcional: acelera as tabelas de acertos dos backtests
+except ImportError:
+    np = None
+
+try:
+    from numba import njit  # opcional: compila o laço de custo/payout do gate ABCD
+except ImportError:
+    njit = None
+
 
 # =========================
 # Normalização / utilitários
@@ -65,13 +80,26 @@ APOSTA17_CUSTO: float = 476.00  # R$ 476,00 (136 apostas de 15 a R$ 3,50)
 def _strip_accents(s: str) -> str:
     return "".join(ch for ch in unicodedata.normalize("NFD", s) if unicodedata.category(ch) != "Mn")
 
+# separadores descartados por _norm (uma passada só via str.translate)
+_NORM_DROP_TABLE = str.maketrans("", "", " _\t\r\n")
+
 def _norm(s: str) -> str:
-    s = _strip_accents((s or "").strip().lower())
-    s = s.replace(" ", "")
-    return s
+    s = (s or "").strip().lower()
+    if not s.isascii():
+        s = _strip_accents(s)
+    return s.translate(_NORM_DROP_TABLE)
 
 
 
+# "00".."25" prontos: formatar dezenas vira indexação de lista
+_TWO_DIGITS = [f"{n:02d}" for n in range(26)]
+
+def _fmt_sorted_nums(seq: List[int]) -> str:
+    """'01 02 03 ...' de uma lista de inteiros JÁ ordenada (não reordena)."""
+    if seq and 0 <= seq[0] and seq[-1] <= 25:
+        return " ".join([_TWO_DIGITS[n] for n in seq])
+    return " ".join(f"{n:02d}" for n in seq)
+
 def _fmt_nums(nums) -> str:
     """Formata uma coleção de dezenas (1..25) como '01 02 03 ...'"""
     if nums is None:
@@ -81,7 +109,7 @@ def _fmt_nums(nums) -> str:
     except TypeError:
         # se vier um único int
         seq = [int(nums)]
-    return " ".join(f"{n:02d}" for n in seq)
+    return _fmt_sorted_nums(seq)
 
 def _fmt_set(st) -> str:
     """Alias para _fmt_nums (mantido por compatibilidade)."""
@@ -109,7 +137,7 @@ def _pick_default_sheet(wb) -> str:
     return wb.sheetnames[0]
 
 def fmt_list(nums: Iterable[int]) -> str:
-    return " ".join(f"{x:02d}" for x in sorted(nums))
+    return _fmt_sorted_nums(sorted(nums))
 
 def now_stamp() -> str:
     return datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -130,6 +158,18 @@ def to_mask(nums: Set[int]) -> int:
 def hits_mask(a_mask: int, b_mask: int) -> int:
     return (a_mask & b_mask).bit_count()
 
+# popcount de 16 bits em tabela, para numpy < 2.0 (sem np.bitwise_count)
+if np is not None and not hasattr(np, "bitwise_count"):
+    POPCNT16 = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)
+else:
+    POPCNT16 = None
+
+def popcount_u32(a: "np.ndarray") -> "np.ndarray":
+    """popcount elemento a elemento de um array uint32 (np.bitwise_count ou POPCNT16)."""
+    if POPCNT16 is None:
+        return np.bitwise_count(a)
+    return POPCNT16[a & 0xFFFF] + POPCNT16[a >> 16]
+
 def _to_int(v) -> Optional[int]:
     if v is None:
         return None
@@ -167,6 +207,8 @@ def _to_date(v) -> Optional[date]:
     return None
 
 _money_re = re.compile(r"[-+]?\d[\d\.]*\,\d+|[-+]?\d[\d,]*\.\d+|[-+]?\d+")
+# "1.252,57" -> "1252.57" num único translate (milhar sai, vírgula vira ponto)
+_MONEY_BR_TABLE = str.maketrans({".": None, ",": ".", " ": None})
 
 def _to_float_money(v) -> Optional[float]:
     """
@@ -185,7 +227,13 @@ def _to_float_money(v) -> Optional[float]:
     s = str(v).strip()
     if not s:
         return None
-    m = _money_re.search(s.replace("R$", "").replace(" ", ""))
+    s = s.replace("R$", "")
+    # caminho rápido: formato BR limpo (vírgula como último separador)
+    if "," in s and s.rfind(",") > s.rfind("."):
+        t = s.translate(_MONEY_BR_TABLE)
+        if t[:1] != "." and t[-1:] != "." and t.replace(".", "", 1).isdecimal():
+            return float(t)
+    m = _money_re.search(s.replace(" ", ""))
     if not m:
         return None
     num = m.group(0)
@@ -219,12 +267,31 @@ class Draw:
     def date(self) -> date:
         return self.data
 
-def _find_header_row(ws, max_scan_rows: int = 80) -> Tuple[int, Tuple]:
+def _draw_index(draws: List[Draw], concurso: int) -> Optional[int]:
+    """
+    Índice do concurso em 'draws' (ordenado por concurso, como sai de read_draws_xlsx).
+    Concursos normalmente são contíguos -> índice direto; se houver buracos, busca binária.
+    """
+    if not draws:
+        return None
+    idx = concurso - draws[0].concurso
+    if 0 <= idx < len(draws) and draws[idx].concurso == concurso:
+        return idx
+    idx = bisect.bisect_left(draws, concurso, key=lambda d: d.concurso)
+    if idx < len(draws) and draws[idx].concurso == concurso:
+        return idx
+    return None
+
+def _find_header_row(ws, max_scan_rows: int = 80, rows: Optional[Iterable[Tuple]] = None) -> Tuple[int, Tuple]:
     """
     Procura cabeçalho nas primeiras N linhas.
     Exige: Concurso + Data + Bola1..Bola15
+    Se 'rows' (iterador de ws.iter_rows(values_only=True)) for passado, consome só até
+    o cabeçalho e o chamador continua dele nas linhas de dados (uma única leitura).
     """
-    for row_idx, row in enumerate(ws.iter_rows(min_row=1, max_row=max_scan_rows, values_only=True), start=1):
+    if rows is None:
+        rows = ws.iter_rows(min_row=1, max_row=max_scan_rows, values_only=True)
+    for row_idx, row in enumerate(itertools.islice(rows, max_scan_rows), start=1):
         if not row:
             continue
         normed = [_norm(str(x) if x is not None else "") for x in row]
@@ -236,7 +303,9 @@ def _find_header_row(ws, max_scan_rows: int = 80) -> Tuple[int, Tuple]:
     raise ValueError("Não encontrei o cabeçalho (Concurso/Data Sorteio/Bola1..Bola15) nas primeiras linhas.")
 
 def read_draws_xlsx(path: str, sheet_name: Optional[str] = None, diagnostico: bool = False) -> Tuple[List[Draw], str]:
-    wb = load_workbook(path, data_only=True, read_only=False)
+    # read_only: leitura em streaming (sem montar células/estilos em memória).
+    # Em read_only o workbook segura o arquivo aberto -> wb.close() após ler as linhas.
+    wb = load_workbook(path, data_only=True, read_only=True)
 
     if sheet_name:
         real_sheet = _sheet_match(wb, sheet_name)
@@ -245,7 +314,9 @@ def read_draws_xlsx(path: str, sheet_name: Optional[str] = None, diagnostico: bo
         real_sheet = _pick_default_sheet(wb)
         ws = wb[real_sheet]
 
-    header_row_idx, header = _find_header_row(ws)
+    # um só iterador: cabeçalho e dados saem da mesma passada pelo XML da planilha
+    rows = ws.iter_rows(values_only=True)
+    header_row_idx, header = _find_header_row(ws, rows=rows)
 
     header_map: Dict[str, int] = {}
     for idx, col in enumerate(header):
@@ -279,7 +350,7 @@ def read_draws_xlsx(path: str, sheet_name: Optional[str] = None, diagnostico: bo
     total_linhas = 0
     linhas_ok = 0
 
-    for r in ws.iter_rows(min_row=header_row_idx + 1, values_only=True):
+    for r in rows:
         total_linhas += 1
         if not r or len(r) <= max(idx_bolas):
             continue
@@ -314,6 +385,8 @@ def read_draws_xlsx(path: str, sheet_name: Optional[str] = None, diagnostico: bo
         draws.append(Draw(concurso=concurso, data=d, bolas=s, mask=to_mask(s), premios=premios))
         linhas_ok += 1
 
+    wb.close()
+
     if diagnostico:
         print(f"[DIAG] Aba usada: {real_sheet}")
         print(f"[DIAG] Cabeçalho na linha: {header_row_idx}")
@@ -337,13 +410,58 @@ def read_draws_xlsx(path: str, sheet_name: Optional[str] = None, diagnostico: bo
 
 CAIXA_URL = "https://servicebus3.caixa.gov.br/portaldeloterias/api/resultados/download?modalidade=Lotof%C3%A1cil"
 
+_RESULTS_NAME_RE = re.compile(r"^resultados_(\d{2})(\d{2})(\d{4})\.xlsx$")
+_MAX_AGE_RE = re.compile(r"max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+def _results_meta_path(xlsx_path: str) -> str:
+    """resultados_DDMMYYYY.xlsx -> resultados_DDMMYYYY.meta.json (ETag/Last-Modified do download)."""
+    return os.path.splitext(xlsx_path)[0] + ".meta.json"
+
+def _load_results_meta(xlsx_path: str) -> Dict[str, Any]:
+    try:
+        with open(_results_meta_path(xlsx_path), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return meta if isinstance(meta, dict) else {}
+    except Exception:
+        return {}
+
+def _save_results_meta(xlsx_path: str, headers: Any, prev: Optional[Dict[str, Any]] = None) -> None:
+    """Grava o sidecar; num 304 o servidor pode omitir ETag/Last-Modified, então mantém os anteriores."""
+    prev = prev or {}
+    m = _MAX_AGE_RE.search(headers.get("Cache-Control") or "")
+    meta = {
+        "etag": headers.get("ETag") or prev.get("etag"),
+        "last_modified": headers.get("Last-Modified") or prev.get("last_modified"),
+        "max_age": int(m.group(1)) if m else None,
+        "fetched_at": datetime.now().timestamp(),
+    }
+    try:
+        with open(_results_meta_path(xlsx_path), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+    except Exception as e:
+        print(f"[WARN] Não consegui gravar {_results_meta_path(xlsx_path)}: {e}")
+
+def _latest_cached_results() -> Optional[str]:
+    """resultados_DDMMYYYY.xlsx mais recente (pela data do nome) que tenha sidecar .meta.json."""
+    best_key, best = None, None
+    for name in os.listdir("."):
+        mo = _RESULTS_NAME_RE.match(name)
+        if not mo or not os.path.exists(_results_meta_path(name)):
+            continue
+        key = (mo.group(3), mo.group(2), mo.group(1))
+        if best_key is None or key > best_key:
+            best_key, best = key, name
+    return best
+
 def ensure_results_file(user_path: Optional[str]) -> str:
     """
     Se o usuário passou --resultados_xlsx, usa exatamente esse path.
     Senão:
       - procura resultados_DDMMYYYY.xlsx (hoje)
       - senão procura resultados_DDMMYYYY.xlsx (ontem)
-      - senão baixa da CAIXA e salva como hoje
+      - senão baixa da CAIXA e salva como hoje; se houver um download anterior com
+        sidecar .meta.json, faz GET condicional (If-None-Match/If-Modified-Since) e,
+        com HTTP 304 (ou dentro do Cache-Control max-age), reaproveita o arquivo local
     """
     if user_path:
         return user_path
@@ -360,22 +478,53 @@ def ensure_results_file(user_path: Optional[str]) -> str:
         print(f"[OK] Usando arquivo do dia anterior: {f_yest}")
         return f_yest
 
+    prev_path = _latest_cached_results()
+    prev_meta = _load_results_meta(prev_path) if prev_path else {}
+    cond_headers: Dict[str, str] = {}
+    if prev_path:
+        max_age = prev_meta.get("max_age")
+        fetched_at = prev_meta.get("fetched_at")
+        if max_age and fetched_at and datetime.now().timestamp() - float(fetched_at) < float(max_age):
+            print(f"[OK] Usando {prev_path} (dentro do max-age informado pela CAIXA)")
+            return prev_path
+        if prev_meta.get("etag"):
+            cond_headers["If-None-Match"] = prev_meta["etag"]
+        if prev_meta.get("last_modified"):
+            cond_headers["If-Modified-Since"] = prev_meta["last_modified"]
+
     print("[DL] Baixando resultados mais recentes da CAIXA...")
     try:
         import requests
     except Exception as e:
         raise SystemExit("ERRO: para baixar automaticamente, instale requests: pip install requests") from e
 
+    # download em streaming (chunks direto no disco, sem bufferizar o XLSX inteiro);
+    # grava em .part e só renomeia no fim -> um download interrompido não vira "arquivo de hoje"
+    tmp_path = f_today + ".part"
     try:
-        resp = requests.get(CAIXA_URL, timeout=45, verify=False)
+        with requests.get(CAIXA_URL, headers=cond_headers or None, timeout=45, verify=False, stream=True) as resp:
+            if resp.status_code == 304 and prev_path:
+                _save_results_meta(prev_path, resp.headers, prev_meta)
+                print(f"[OK] Sem novidades na CAIXA (HTTP 304); usando {prev_path}")
+                return prev_path
+            if resp.status_code != 200:
+                raise SystemExit(f"ERRO: download falhou (HTTP {resp.status_code}).")
+            written = 0
+            with open(tmp_path, "wb") as f:
+                for chunk in resp.iter_content(chunk_size=64 * 1024):
+                    if chunk:
+                        f.write(chunk)
+                        written += len(chunk)
+    except SystemExit:
+        raise
     except Exception as e:
         raise SystemExit(f"ERRO: falha ao baixar arquivo da CAIXA: {e}") from e
 
-    if resp.status_code != 200 or not resp.content:
+    if not written:
+        os.remove(tmp_path)
         raise SystemExit(f"ERRO: download falhou (HTTP {resp.status_code}).")
-
-    with open(f_today, "wb") as f:
-        f.write(resp.content)
+    os.replace(tmp_path, f_today)
+    _save_results_meta(f_today, resp.headers)
 
     print(f"[OK] Arquivo salvo como {f_today}")
     return f_today
@@ -395,41 +544,67 @@ def ensure_resultado_norm_column(xlsx_path: str, sheet_name: Optional[str], draw
     - não reordena nada; só escreve o texto normalizado
     """
     try:
-        wb = load_workbook(xlsx_path, data_only=False, read_only=False)
-        ws = wb[sheet_used]
-        header_row_idx, header = _find_header_row(ws)
-        # mapa colunas
-        header_map = {}
-        for idx, col in enumerate(header, start=1):
-            header_map[_norm(str(col) if col is not None else "")] = idx
-        # encontra colunas concurso e bola1
-        idx_conc = header_map.get("concurso")
-        if not idx_conc:
-            return
-        # coluna destino
         col_name = "ResultadoNorm"
         norm_key = _norm(col_name)
-        dest_col = header_map.get(norm_key)
+        # monta lookup concurso->resultado
+        lookup = {d.concurso: fmt_list(d.bolas) for d in draws}
+
+        # 1a passada em read_only (streaming): acha as linhas de cada concurso e compara com
+        # o que já está gravado; o load completo (células/estilos) só acontece se houver o que escrever
+        wb = load_workbook(xlsx_path, data_only=False, read_only=True)
+        try:
+            ws = wb[sheet_used]
+            rows = ws.iter_rows(values_only=True)
+            header_row_idx, header = _find_header_row(ws, rows=rows)
+            # mapa colunas
+            header_map = {}
+            for idx, col in enumerate(header, start=1):
+                header_map[_norm(str(col) if col is not None else "")] = idx
+            # encontra colunas concurso e destino
+            idx_conc = header_map.get("concurso")
+            if not idx_conc:
+                return
+            dest_col = header_map.get(norm_key)
+
+            pending: Dict[int, str] = {}  # linha -> valor a gravar
+            matched = 0
+            for r, row in enumerate(rows, start=header_row_idx + 1):
+                if len(row) < idx_conc:
+                    continue
+                conc = _to_int(row[idx_conc - 1])
+                if conc is None:
+                    continue
+                val = lookup.get(conc)
+                if not val:
+                    continue
+                matched += 1
+                cur = row[dest_col - 1] if dest_col and len(row) >= dest_col else None
+                if cur != val:
+                    pending[r] = val
+        finally:
+            wb.close()
+
+        if dest_col and not pending:
+            print(f"[OK] Coluna '{col_name}' já está atualizada ({matched} linhas); XLSX não regravado")
+            return
+
+        wb = load_workbook(xlsx_path, data_only=False, read_only=False)
+        ws = wb[sheet_used]
         if not dest_col:
             dest_col = ws.max_column + 1
             ws.cell(row=header_row_idx, column=dest_col, value=col_name)
 
-        # monta lookup concurso->resultado
-        lookup = {d.concurso: fmt_list(d.bolas) for d in draws}
-
-        # percorre linhas e escreve
+        # escreve só as linhas que mudaram
         updated = 0
-        for r in range(header_row_idx + 1, ws.max_row + 1):
-            conc = _to_int(ws.cell(row=r, column=idx_conc).value)
-            if conc is None:
-                continue
-            val = lookup.get(conc)
-            if not val:
-                continue
+        for r, val in pending.items():
             ws.cell(row=r, column=dest_col, value=val)
             updated += 1
 
-        wb.save(xlsx_path)
+        # grava em arquivo temporário e troca atômica: quem estiver lendo o XLSX em paralelo
+        # (abcd_runner) vê sempre o arquivo antigo ou o novo completo, nunca um parcial
+        tmp_path = xlsx_path + ".tmp"
+        wb.save(tmp_path)
+        os.replace(tmp_path, xlsx_path)
         print(f"[OK] Coluna '{col_name}' atualizada: {updated} linhas em {xlsx_path}")
     except Exception as e:
         print(f"[WARN] Não consegui atualizar 'ResultadoNorm' no XLSX: {e}")
@@ -439,28 +614,65 @@ def ensure_resultado_norm_column(xlsx_path: str, sheet_name: Optional[str], draw
 # Ranking (freq/delay) para escolhas
 # =========================
 
-def _rank_frequency(draws: List[Draw], window: Optional[int] = None) -> Dict[int, int]:
-    use = draws[-window:] if (window is not None and window > 0 and window < len(draws)) else draws
-    freq = {i: 0 for i in range(1, 26)}
-    for dr in use:
+# a partir de quantos concursos vale montar a matriz de bits em numpy (abaixo disso o
+# laço em Python sai mais barato que o overhead de montar os arrays)
+RANK_NUMPY_MIN = 64
+
+def _bits_matrix(draws: List[Draw], start: int = 0, stop: Optional[int] = None) -> "np.ndarray":
+    """
+    Matriz (stop-start, 25) uint8 de draws[start:stop]: coluna n-1 = 1 se a dezena n saiu.
+    Uma leitura de Draw.mask por concurso, sem percorrer os sets de dezenas.
+    """
+    if stop is None:
+        stop = len(draws)
+    masks = np.fromiter((d.mask for d in itertools.islice(draws, start, stop)), dtype="<u4", count=stop - start)
+    bits = np.unpackbits(masks.view(np.uint8).reshape(-1, 4), axis=1, bitorder="little")
+    return bits[:, :25]
+
+def _rank_span(draws: List[Draw], window: Optional[int], end: Optional[int]) -> Tuple[int, int]:
+    """
+    [start, stop) dos concursos usados no ranking: histórico = draws[:end] (end=None => tudo),
+    limitado aos últimos `window`. Índices em vez de fatiar => sem copiar o prefixo a cada base.
+    """
+    stop = len(draws) if end is None else min(max(0, end), len(draws))
+    start = stop - window if (window is not None and window > 0 and window < stop) else 0
+    return start, stop
+
+def _rank_frequency(draws: List[Draw], window: Optional[int] = None, end: Optional[int] = None) -> Dict[int, int]:
+    start, stop = _rank_span(draws, window, end)
+    if np is not None and stop - start >= RANK_NUMPY_MIN:
+        counts = _bits_matrix(draws, start, stop).sum(axis=0, dtype=np.int64).tolist()
+        return {n: counts[n - 1] for n in range(1, 26)}
+    # lista indexada pela dezena (posição 0 sem uso): índice em vez de hash de dict
+    freq = [0] * 26
+    for dr in itertools.islice(draws, start, stop):
         for n in dr.bolas:
             freq[n] += 1
-    return freq
-
-def _rank_delay(draws: List[Draw], window: Optional[int] = None) -> Dict[int, int]:
-    use = draws[-window:] if (window is not None and window > 0 and window < len(draws)) else draws
-    last_seen = {i: None for i in range(1, 26)}
-    for idx, dr in enumerate(use):
+    return {n: freq[n] for n in range(1, 26)}
+
+def _rank_delay(draws: List[Draw], window: Optional[int] = None, end: Optional[int] = None) -> Dict[int, int]:
+    start, stop = _rank_span(draws, window, end)
+    size = stop - start
+    if np is not None and size >= RANK_NUMPY_MIN:
+        # atraso = posição da 1a ocorrência contando do fim; nunca saiu => size
+        rev = _bits_matrix(draws, start, stop)[::-1]
+        seen = rev.any(axis=0).tolist()
+        pos = rev.argmax(axis=0).tolist()
+        return {n: (pos[n - 1] if seen[n - 1] else size) for n in range(1, 26)}
+    last_seen = [-1] * 26  # -1 = nunca saiu na janela
+    for idx, dr in enumerate(itertools.islice(draws, start, stop)):
         for n in dr.bolas:
             last_seen[n] = idx
-    max_idx = len(use) - 1
-    delay = {}
-    for n in range(1, 26):
-        if last_seen[n] is None:
-            delay[n] = len(use)
-        else:
-            delay[n] = max_idx - last_seen[n]
-    return delay
+    max_idx = size - 1
+    return {n: (max_idx - last_seen[n]) if last_seen[n] >= 0 else size for n in range(1, 26)}
+
+# pesos (freq, delay) do score por modo; modo desconhecido => mixed.
+# 1.0*f + 0.0*d == f exatamente (idem delay), então os scores são os mesmos dos if/else antigos.
+MODE_WEIGHTS: Dict[str, Tuple[float, float]] = {
+    "freq": (1.0, 0.0),
+    "delay": (0.0, 1.0),
+    "mixed": (1.0, 0.25),
+}
 
 def _score_number(n: int, freq: Dict[int, int], delay: Dict[int, int], mode: str) -> float:
     """
@@ -469,27 +681,22 @@ def _score_number(n: int, freq: Dict[int, int], delay: Dict[int, int], mode: str
     - mode=delay:      mais delay => maior score
     - mode=mixed:      (freq) + 0.25*(delay)
     """
-    if mode == "freq":
-        return float(freq.get(n, 0))
-    if mode == "delay":
-        return float(delay.get(n, 0))
-    return float(freq.get(n, 0)) + 0.25 * float(delay.get(n, 0))
+    w_f, w_d = MODE_WEIGHTS.get(mode, MODE_WEIGHTS["mixed"])
+    return w_f * float(freq.get(n, 0)) + w_d * float(delay.get(n, 0))
 
 def _pick_exclusions(candidates: Iterable[int], k: int, freq: Dict[int, int], delay: Dict[int, int], rank_mode: str, seed: Optional[int]) -> List[int]:
-    c = sorted(set(candidates))
+    # candidates: iterável de dezenas ou bitmask (int, ver to_mask)
+    c = _mask_to_sorted(candidates) if isinstance(candidates, int) else sorted(set(candidates))
     if k <= 0:
         return []
     if len(c) <= k:
         return c[:]
-    # escolhe os "piores" scores para EXCLUIR (mantém os melhores)
-    scored = [( _score_number(n, freq, delay, rank_mode), n) for n in c]
-    scored.sort(key=lambda t: (t[0], t[1]))  # menores primeiro
-    # desempate aleatório opcional: embaralha bloco final, mas sem perder determinismo
-    if seed is not None:
-        random.seed(seed)
-    # pega k menores
-    out = [n for _s, n in scored[:k]]
-    return sorted(out)
+    # escolhe os "piores" scores para EXCLUIR (mantém os melhores): os k menores
+    # (score, dezena), empate resolvido pela dezena menor -- mesmo que ordenar e cortar em k.
+    # Determinístico: seed fica na assinatura, mas não há sorteio aqui.
+    w_f, w_d = MODE_WEIGHTS.get(rank_mode, MODE_WEIGHTS["mixed"])
+    smallest = heapq.nsmallest(k, ((w_f * float(freq.get(n, 0)) + w_d * float(delay.get(n, 0)), n) for n in c))
+    return sorted(n for _s, n in smallest)
 
 
 # =========================
@@ -510,25 +717,35 @@ class Closure:
     grupo_S: Set[int]
     cartoes: Dict[str, Set[int]]  # AR, AS, BR, BS
 
-def _split_remaining(remaining: List[int], size1: int, size2: int, seed: Optional[int], prefer_no_overlap: bool = True) -> Tuple[List[int], List[int]]:
+def _local_rng(seed: Optional[int], rng: Optional[random.Random] = None):
+    """
+    Gerador para os sorteios internos sem reiniciar o `random` global:
+    - rng explícito: usado como está (o chamador controla a sequência)
+    - seed: random.Random(seed) novo => mesma sequência do antigo random.seed(seed) por chamada
+    - sem seed: o gerador global do módulo random (comportamento não determinístico de sempre)
+    """
+    if rng is not None:
+        return rng
     if seed is not None:
-        random.seed(seed)
+        return random.Random(seed)
+    return random
+
+def _split_remaining(remaining: List[int], size1: int, size2: int, seed: Optional[int], prefer_no_overlap: bool = True, rng: Optional[random.Random] = None) -> Tuple[List[int], List[int]]:
     rem = list(sorted(set(remaining)))
-    random.shuffle(rem)
+    _local_rng(seed, rng).shuffle(rem)
     a = rem[:size1]
-    rem2 = [x for x in rem if x not in set(a)] if prefer_no_overlap else rem[:]
+    a_set = set(a)  # fora da comprehension: set(a) no filtro era recriado a cada elemento
+    rem2 = [x for x in rem if x not in a_set] if prefer_no_overlap else rem[:]
     b = rem2[:size2]
     if len(b) < size2:
         need = size2 - len(b)
-        extra = [x for x in a if x not in set(b)]
+        b_set = set(b)
+        extra = [x for x in a if x not in b_set]
         b.extend(extra[:need])
         b = b[:size2]
     return sorted(a), sorted(b)
 
-def _choose_fixed_from_set(candidates: List[int], k: int, mode: str, draws_before: List[Draw], window: int, seed: Optional[int]) -> List[int]:
-    if seed is not None:
-        random.seed(seed)
-
+def _choose_fixed_from_set(candidates: List[int], k: int, mode: str, draws_before: List[Draw], window: int, seed: Optional[int], rng: Optional[random.Random] = None) -> List[int]:
     if k <= 0:
         return []
 
@@ -538,7 +755,7 @@ def _choose_fixed_from_set(candidates: List[int], k: int, mode: str, draws_befor
 
     mode = (mode or "random").strip().lower()
     if mode == "random":
-        return sorted(random.sample(cset, k))
+        return sorted(_local_rng(seed, rng).sample(cset, k))
 
     if mode in ("freq_window", "freq_all"):
         freq = _rank_frequency(draws_before, window if mode == "freq_window" else None)
@@ -550,30 +767,33 @@ def _choose_fixed_from_set(candidates: List[int], k: int, mode: str, draws_befor
         cset.sort(key=lambda n: (delay.get(n, 0), n), reverse=True)
         return sorted(cset[:k])
 
-    return sorted(random.sample(cset, k))
+    return sorted(_local_rng(seed, rng).sample(cset, k))
 
-def build_closure_for_base(base: Draw, draws_before_including_base: List[Draw], fix_s_mode: str, fix_n_mode: str, window: int, seed: Optional[int]) -> Closure:
+def build_closure_for_base(base: Draw, draws_before_including_base: List[Draw], fix_s_mode: str, fix_n_mode: str, window: int, seed: Optional[int], rng: Optional[random.Random] = None) -> Closure:
+    # rng (opcional): gerador próprio do chamador, compartilhado pelos sorteios abaixo;
+    # sem ele cada etapa usa random.Random(seed) (mesmo resultado de antes, sem estado global)
     sorteadas = set(base.bolas)
-    nao_sorteadas = set(range(1, 26)) - sorteadas
+    nao_sorteadas = UNIVERSO - sorteadas
 
-    fix_s = set(_choose_fixed_from_set(sorted(sorteadas), 3, fix_s_mode, draws_before_including_base, window, seed))
-    fix_n = set(_choose_fixed_from_set(sorted(nao_sorteadas), 2, fix_n_mode, draws_before_including_base, window, seed))
+    fix_s = set(_choose_fixed_from_set(sorted(sorteadas), 3, fix_s_mode, draws_before_including_base, window, seed, rng))
+    fix_n = set(_choose_fixed_from_set(sorted(nao_sorteadas), 2, fix_n_mode, draws_before_including_base, window, seed, rng))
 
     remaining_s = sorted(sorteadas - fix_s)
-    a_extra, b_extra = _split_remaining(remaining_s, 6, 6, seed=seed, prefer_no_overlap=True)
-    grupo_A = set(fix_s) | set(a_extra)
-    grupo_B = set(fix_s) | set(b_extra)
+    a_extra, b_extra = _split_remaining(remaining_s, 6, 6, seed=seed, prefer_no_overlap=True, rng=rng)
+    grupo_A = fix_s.union(a_extra)
+    grupo_B = fix_s.union(b_extra)
 
     remaining_n = sorted(nao_sorteadas - fix_n)
-    r_extra, s_extra = _split_remaining(remaining_n, 4, 4, seed=seed, prefer_no_overlap=True)
-    grupo_R = set(fix_n) | set(r_extra)
-    grupo_S = set(fix_n) | set(s_extra)
+    r_extra, s_extra = _split_remaining(remaining_n, 4, 4, seed=seed, prefer_no_overlap=True, rng=rng)
+    grupo_R = fix_n.union(r_extra)
+    grupo_S = fix_n.union(s_extra)
 
+    # fix_s/fix_n e os grupos já são sets novos: união direta, sem cópias intermediárias
     cartoes = {
-        "AR": set(grupo_A) | set(grupo_R),
-        "AS": set(grupo_A) | set(grupo_S),
-        "BR": set(grupo_B) | set(grupo_R),
-        "BS": set(grupo_B) | set(grupo_S),
+        "AR": grupo_A | grupo_R,
+        "AS": grupo_A | grupo_S,
+        "BR": grupo_B | grupo_R,
+        "BS": grupo_B | grupo_S,
     }
 
     for nome, c in cartoes.items():
@@ -606,6 +826,19 @@ METADE_14_25: Set[int] = set(range(14,26))
 PARES: Set[int] = {2,4,6,8,10,12,14,16,18,20,22,24}
 IMPARES: Set[int] = UNIVERSO - PARES
 
+# mesmos grupos em bitmask (bit n-1 = dezena n, como to_mask/Draw.mask): o pool20 monta
+# sorteadas/ausentes e os candidatos de cada padrão sem criar sets a cada base
+UNIVERSO_MASK = to_mask(UNIVERSO)
+MOLDURA_MASK = to_mask(MOLDURA)
+MIOLO_MASK = to_mask(MIOLO)
+METADE_1_13_MASK = to_mask(METADE_1_13)
+METADE_14_25_MASK = to_mask(METADE_14_25)
+PARES_MASK = to_mask(PARES)
+IMPARES_MASK = to_mask(IMPARES)
+
+def _mask_to_sorted(m: int) -> List[int]:
+    return [n for n in range(1, 26) if (m >> (n - 1)) & 1]
+
 @dataclass
 class Pool20Plan:
     padrao: str
@@ -624,11 +857,11 @@ def _pool20_make_games(pool20: List[int]) -> Dict[str, Set[int]]:
     """
     if len(pool20) != 20:
         raise SystemExit("ERRO interno: pool20 precisa ter 20 dezenas.")
-    blocks = [pool20[i*4:(i+1)*4] for i in range(5)]
+    # elemento i de cada bloco de 4 = posições i, i+4, ..., i+16 => pool20[i::4]
+    pool_set = set(pool20)
     games: Dict[str, Set[int]] = {}
     for i in range(4):
-        excluded = {blocks[b][i] for b in range(5)}  # 5 números
-        g = set(pool20) - excluded
+        g = pool_set.difference(pool20[i::4])  # exclui 5 números
         if len(g) != 15:
             raise SystemExit("ERRO interno: jogo pool20 não ficou com 15 números.")
         games[f"P{i+1}"] = g
@@ -641,20 +874,29 @@ def build_pool20_for_base(
     window: int,
     seed: Optional[int],
     rank_mode: str,
+    *,
+    freq: Optional[Dict[int, int]] = None,
+    delay: Optional[Dict[int, int]] = None,
+    history_end: Optional[int] = None,
 ) -> Pool20Plan:
     """
     Monta POOL20 (20 dezenas) excluindo 5 conforme o padrão.
     Usa histórico (freq/delay) para decidir quais excluir dentro de cada subconjunto.
+    freq/delay já calculados (ex.: pelo walk-forward incremental do gate) evitam recontar
+    o histórico inteiro; se omitidos, são calculados a partir de history_until_base.
+    history_end: histórico = history_until_base[:history_end] (passa a lista inteira sem fatiar).
     """
     padrao = (padrao or "resultado").strip().lower()
     if padrao not in ("resultado", "moldura", "metade", "paridade"):
         raise SystemExit("ERRO: --pool20_padrao deve ser resultado|moldura|metade|paridade")
 
-    freq = _rank_frequency(history_until_base, window if window and window > 0 else None)
-    delay = _rank_delay(history_until_base, window if window and window > 0 else None)
+    if freq is None:
+        freq = _rank_frequency(history_until_base, window if window and window > 0 else None, history_end)
+    if delay is None:
+        delay = _rank_delay(history_until_base, window if window and window > 0 else None, history_end)
 
-    sorteadas = set(base.bolas)
-    ausentes = UNIVERSO - sorteadas
+    sorteadas = base.mask
+    ausentes = UNIVERSO_MASK & ~sorteadas
 
     excluded: List[int] = []
 
@@ -665,21 +907,21 @@ def build_pool20_for_base(
         excluded = sorted(exc_s + exc_a)
 
     elif padrao == "moldura":
-        exc_m = _pick_exclusions(MOLDURA, 3, freq, delay, rank_mode, seed)
-        exc_i = _pick_exclusions(MIOLO, 2, freq, delay, rank_mode, seed)
+        exc_m = _pick_exclusions(MOLDURA_MASK, 3, freq, delay, rank_mode, seed)
+        exc_i = _pick_exclusions(MIOLO_MASK, 2, freq, delay, rank_mode, seed)
         excluded = sorted(exc_m + exc_i)
 
     elif padrao == "metade":
-        exc_a = _pick_exclusions(METADE_1_13, 3, freq, delay, rank_mode, seed)
-        exc_b = _pick_exclusions(METADE_14_25, 2, freq, delay, rank_mode, seed)
+        exc_a = _pick_exclusions(METADE_1_13_MASK, 3, freq, delay, rank_mode, seed)
+        exc_b = _pick_exclusions(METADE_14_25_MASK, 2, freq, delay, rank_mode, seed)
         excluded = sorted(exc_a + exc_b)
 
     elif padrao == "paridade":
-        exc_imp = _pick_exclusions(IMPARES, 3, freq, delay, rank_mode, seed)
-        exc_par = _pick_exclusions(PARES, 2, freq, delay, rank_mode, seed)
+        exc_imp = _pick_exclusions(IMPARES_MASK, 3, freq, delay, rank_mode, seed)
+        exc_par = _pick_exclusions(PARES_MASK, 2, freq, delay, rank_mode, seed)
         excluded = sorted(exc_imp + exc_par)
 
-    pool20_set = sorted(list(UNIVERSO - set(excluded)))
+    pool20_set = _mask_to_sorted(UNIVERSO_MASK & ~to_mask(excluded))
     if len(pool20_set) != 20:
         raise SystemExit(f"ERRO interno: pool20 ficou com {len(pool20_set)} dezenas (esperado 20).")
 
@@ -701,6 +943,12 @@ class Aposta16Plan:
     s16: Set[int]
     cartoes: Dict[str, Set[int]]  # {"S16": set(...)}
 
+# memo do S16 por (base, histórico, parâmetros): a simulação walk-forward e o gate do
+# aposta16 percorrem as mesmas bases com os mesmos parâmetros na mesma execução.
+# O histórico é sempre um prefixo da mesma lista ordenada => (len, último concurso) o identifica.
+APOSTA16_MEMO_MAX = 4096
+_APOSTA16_MEMO: Dict[Tuple, Tuple[str, List[int], List[int], List[int], frozenset]] = {}
+
 def build_aposta16_for_base(
     base: Draw,
     history_until_base: List[Draw],
@@ -708,11 +956,42 @@ def build_aposta16_for_base(
     window: int,
     seed: Optional[int],
     rank_mode: str,
+    *,
+    freq: Optional[Dict[int, int]] = None,
+    delay: Optional[Dict[int, int]] = None,
+    history_end: Optional[int] = None,
 ) -> Aposta16Plan:
     """
     1) Monta POOL20 usando o mesmo pipeline do pool20 (exclui 5).
     2) A partir do POOL20, exclui mais 4 dezenas (ranking) => sobra S16 (16 dezenas).
+    freq/delay: mesmos rankings do pool20; calculados uma vez e usados nas duas etapas.
+    history_end: como em build_pool20_for_base.
     """
+    hist_len = len(history_until_base) if history_end is None else min(max(0, history_end), len(history_until_base))
+    memo_key = (
+        base.concurso, base.mask,
+        hist_len, history_until_base[hist_len - 1].concurso if hist_len else None,
+        (padrao or "resultado").strip().lower(), window if window and window > 0 else None,
+        seed, rank_mode,
+    )
+    hit = _APOSTA16_MEMO.get(memo_key)
+    if hit is not None:
+        padrao_n, excluded5, pool20, excluded4, s16_frozen = hit
+        s16 = set(s16_frozen)
+        return Aposta16Plan(
+            padrao=padrao_n,
+            excluded5=list(excluded5),
+            pool20=list(pool20),
+            excluded4=list(excluded4),
+            s16=s16,
+            cartoes={"S16": s16},
+        )
+
+    if freq is None:
+        freq = _rank_frequency(history_until_base, window if window and window > 0 else None, history_end)
+    if delay is None:
+        delay = _rank_delay(history_until_base, window if window and window > 0 else None, history_end)
+
     plan20 = build_pool20_for_base(
         base=base,
         history_until_base=history_until_base,
@@ -720,16 +999,20 @@ def build_aposta16_for_base(
         window=window,
         seed=seed,
         rank_mode=rank_mode,
+        freq=freq,
+        delay=delay,
+        history_end=history_end,
     )
 
-    freq = _rank_frequency(history_until_base, window if window and window > 0 else None)
-    delay = _rank_delay(history_until_base, window if window and window > 0 else None)
-
     excluded4 = _pick_exclusions(plan20.pool20, 4, freq, delay, rank_mode, seed)
     s16 = set(plan20.pool20) - set(excluded4)
     if len(s16) != 16:
         raise SystemExit(f"ERRO interno: S16 ficou com {len(s16)} dezenas (esperado 16).")
 
+    if len(_APOSTA16_MEMO) >= APOSTA16_MEMO_MAX:
+        _APOSTA16_MEMO.pop(next(iter(_APOSTA16_MEMO)))
+    _APOSTA16_MEMO[memo_key] = (plan20.padrao, list(plan20.excluded), list(plan20.pool20), list(excluded4), frozenset(s16))
+
     return Aposta16Plan(
         padrao=plan20.padrao,
         excluded5=plan20.excluded,
@@ -762,13 +1045,24 @@ def _aposta16_counts_from_k(k: int) -> Dict[int, int]:
 
 def payout_for_aposta16(draw: Draw, k_hits: int) -> float:
     """Payout total da aposta 16, somando os 16 jogos de 15 derivados, pagando só 11..15."""
-    counts = _aposta16_counts_from_k(k_hits)
+    # mesma conta de _aposta16_counts_from_k, sem montar o dict: (16-k) jogos com k acertos
+    # e depois k jogos com k-1 (mesma ordem de soma)
+    k = int(k_hits)
+    if k < 0: k = 0
+    if k > 15: k = 15
     total = 0.0
-    for h, cnt in counts.items():
-        if 11 <= int(h) <= 15 and int(cnt) > 0:
-            total += float(draw.premios.get(int(h), 0.0)) * int(cnt)
+    if 11 <= k <= 15:
+        total += float(draw.premios.get(k, 0.0)) * (16 - k)
+    if 11 <= k - 1 <= 15:
+        total += float(draw.premios.get(k - 1, 0.0)) * k
     return float(total)
 
+# _APOSTA17_JOGOS_BY_R[hits][r] = C(hits, r) * C(17-hits, 2-r): quantos dos 136 jogos de 15
+# da aposta 17 excluem r dezenas sorteadas (math.comb já dá 0 quando r > hits)
+_APOSTA17_JOGOS_BY_R: Tuple[Tuple[int, int, int], ...] = tuple(
+    tuple(math.comb(h, r) * math.comb(17 - h, 2 - r) for r in (0, 1, 2)) for h in range(16)
+)
+
 def payout_for_aposta17(draw, hits: int) -> float:
     """Approximate payout sum for a 17-number bet by expanding into C(17,15)=136 'jogos' of 15.
     Uses the same payout table as payout_for_hits() for each derived 15-number game.
@@ -778,46 +1072,54 @@ def payout_for_aposta17(draw, hits: int) -> float:
     # Aposta 17 picks 17 numbers; the draw has 15 numbers.
     # When you form each 15-number "jogo" by excluding 2 numbers from the 17,
     # you may exclude r of the hit numbers (0..2), so the derived jogo has hits-r.
-    # Count of such jogos: C(hits, r) * C(17-hits, 2-r)
-    from math import comb
-
+    # Count of such jogos: C(hits, r) * C(17-hits, 2-r)  (table _APOSTA17_JOGOS_BY_R)
     if hits < 0:
         return 0.0
     if hits > 15:
         hits = 15
 
     total = 0.0
-    for r in (0, 1, 2):
-        if r > hits:
-            continue
-        miss_in_set = 17 - hits
-        if (2 - r) > miss_in_set:
-            continue
-        count = comb(hits, r) * comb(miss_in_set, 2 - r)
-        total += count * payout_for_hits(draw, hits - r)
+    for r, count in enumerate(_APOSTA17_JOGOS_BY_R[hits]):
+        if count:
+            total += count * payout_for_hits(draw, hits - r)
     return float(total)
 
 
 
 def _percentile(values: List[float], p: float) -> float:
     """Simple percentile (0-100) with linear interpolation."""
+    return _percentiles(values, (p,))[0]
+
+
+def _percentiles(values: List[float], ps: Iterable[float]) -> List[float]:
+    """Vários percentis (0-100) com uma única ordenação (mesma interpolação de _percentile)."""
+    ps = list(ps)
     if not values:
-        return 0.0
+        return [0.0] * len(ps)
     xs = sorted(float(x) for x in values)
-    if p <= 0:
-        return xs[0]
-    if p >= 100:
-        return xs[-1]
-    k = (len(xs) - 1) * (p / 100.0)
-    f = math.floor(k)
-    c = math.ceil(k)
-    if f == c:
-        return xs[int(k)]
-    d0 = xs[f] * (c - k)
-    d1 = xs[c] * (k - f)
-    return d0 + d1
+    out: List[float] = []
+    for p in ps:
+        if p <= 0:
+            out.append(xs[0])
+            continue
+        if p >= 100:
+            out.append(xs[-1])
+            continue
+        k = (len(xs) - 1) * (p / 100.0)
+        f = math.floor(k)
+        c = math.ceil(k)
+        if f == c:
+            out.append(xs[int(k)])
+            continue
+        d0 = xs[f] * (c - k)
+        d1 = xs[c] * (k - f)
+        out.append(d0 + d1)
+    return out
+
 
 
+_PCT_SEP_RE = re.compile(r"[\s;|]+")
+_PCT_NUM_RE = re.compile(r"[-+]?\d+(?:[\.,]\d+)?")
 
 def _parse_percentiles(value, default: Tuple[float, float] = (40.0, 60.0)) -> Tuple[float, float]:
     """Parse percentile pair from CLI.
@@ -852,7 +1154,7 @@ def _parse_percentiles(value, default: Tuple[float, float] = (40.0, 60.0)) -> Tu
                 p1, p2 = default
             else:
                 # First try to split on common separators. If we get 2+ tokens, interpret as pair.
-                parts = re.split(r"[\s;|]+", s)
+                parts = _PCT_SEP_RE.split(s)
                 if len(parts) == 1 and "," in s:
                     # Comma may be separator for pair: "40,60"
                     comma_parts = [p.strip() for p in s.split(",") if p.strip() != ""]
@@ -872,7 +1174,7 @@ def _parse_percentiles(value, default: Tuple[float, float] = (40.0, 60.0)) -> Tu
                     p1 = p2 = float(nums[0].replace(",", "."))
                 else:
                     # Last resort: extract numbers (may treat comma as decimal separator).
-                    found = re.findall(r"[-+]?\d+(?:[\.,]\d+)?", s)
+                    found = _PCT_NUM_RE.findall(s)
                     if not found:
                         p1, p2 = default
                     elif len(found) == 1:
@@ -900,6 +1202,44 @@ def _parse_percentiles(value, default: Tuple[float, float] = (40.0, 60.0)) -> Tu
             return (40.0, 60.0)
 
 
+def _earliest_success_idx(
+    s16_masks: List[int],
+    base_idxs: List[int],
+    draw_masks: List[int],
+    teimosinha_n: int,
+    min_hits: int,
+) -> List[Optional[int]]:
+    """
+    Para cada base: índice do primeiro alvo (base_idx+1 .. base_idx+teimosinha_n, dentro do
+    histórico) com popcount(S16 & alvo) >= min_hits, ou None se nenhum chegou lá.
+    Com numpy a tabela (bases, teimosinha_n) de acertos sai de uma vez; sem numpy, laço por base.
+    """
+    n = len(draw_masks)
+    if np is not None and s16_masks and teimosinha_n > 0:
+        s16 = np.array(s16_masks, dtype=np.uint32)
+        d = np.array(draw_masks + [0], dtype=np.uint32)   # posição n = sentinela p/ alvos além do fim
+        t = np.array(base_idxs)[:, None] + np.arange(1, teimosinha_n + 1)[None, :]
+        valid = t < n
+        hits = popcount_u32(s16[:, None] & d[np.where(valid, t, n)])
+        ok = valid & (hits >= max(0, min_hits))
+        first = ok.argmax(axis=1).tolist()
+        any_ok = ok.any(axis=1).tolist()
+        return [(b + 1 + f) if a else None for b, f, a in zip(base_idxs, first, any_ok)]
+
+    out: List[Optional[int]] = []
+    for s16_mask, base_idx in zip(s16_masks, base_idxs):
+        hit_idx = None
+        for off in range(1, teimosinha_n + 1):
+            t_idx = base_idx + off
+            if t_idx >= n:
+                break
+            if (s16_mask & draw_masks[t_idx]).bit_count() >= min_hits:
+                hit_idx = t_idx
+                break
+        out.append(hit_idx)
+    return out
+
+
 def compute_aposta16_gate_stats(
     draws: List[Draw],
     *,
@@ -947,58 +1287,61 @@ def compute_aposta16_gate_stats(
         }
 
     start = max(1, n - lookback_bases)  # base index starts at 1 (since base uses prev)
-    wins = 0
-    trials = 0
     success_targets: List[int] = []          # target indices where success happened (for concursos metric)
     success_target_dates: List[datetime] = []  # dates of those targets (for dias metric)
 
+    # freq/atraso incrementais: o histórico de cada base é o da anterior + 1 concurso,
+    # então só somamos o concurso que entra (e tiramos o que sai da janela) em vez de
+    # recontar tudo a cada base. Mesmo resultado de _rank_frequency/_rank_delay.
+    win = window if window and window > 0 else None
+    freq_cnt = [0] * 26
+    last_abs = [-1] * 26   # índice absoluto da última ocorrência (-1 = nunca)
+    hist_len = 0
+
+    # 1a fase: S16 de cada base (em máscara); 2a fase: tabela de acertos de todas as bases
+    base_idxs: List[int] = []
+    s16_masks: List[int] = []
     for base_idx in range(start, n - 1):
         base = draws[base_idx - 1]
+        h = max(0, base_idx - 1)
+        while hist_len < h:
+            for x in draws[hist_len].bolas:
+                freq_cnt[x] += 1
+                last_abs[x] = hist_len
+            if win is not None and hist_len >= win:
+                for x in draws[hist_len - win].bolas:
+                    freq_cnt[x] -= 1
+            hist_len += 1
+        use_len = min(win, h) if win is not None else h
+        lo = h - use_len
+        freq = {x: freq_cnt[x] for x in range(1, 26)}
+        delay = {x: (h - 1 - last_abs[x]) if last_abs[x] >= lo else use_len for x in range(1, 26)}
+
         plan16 = build_aposta16_for_base(
             base=base,
-            history_until_base=draws[:max(0, base_idx - 1)],
+            history_until_base=draws,
+            history_end=h,
             window=window,
             padrao=pool20_padrao,
             rank_mode=pool20_rank,
             seed=seed,
+            freq=freq,
+            delay=delay,
         )
 
-        # search success in next teimosinha_n draws
-        best_hits = -1
-        best_when = None
-        best_t_idx = None
-        for off in range(1, teimosinha_n + 1):
-            t_idx = base_idx + off
-            if t_idx >= n:
-                break
-            target = draws[t_idx]
-            k = len(set(plan16.s16) & set(target.bolas))
-            if k > best_hits:
-                best_hits = k
-                best_when = target.data
-                best_t_idx = t_idx
+        base_idxs.append(base_idx)
+        s16_masks.append(to_mask(plan16.s16))
 
-        trials += 1
-        if best_hits >= min_hits:
+    # success in next teimosinha_n draws: the earliest target reaching min_hits
+    # is the success event (we want gap distribution between actual hits)
+    draw_masks = [d.mask for d in draws]
+    trials = len(base_idxs)
+    wins = 0
+    for success_t_idx in _earliest_success_idx(s16_masks, base_idxs, draw_masks, teimosinha_n, min_hits):
+        if success_t_idx is not None:
             wins += 1
-            # record the earliest target within teimosinha window that reaches min_hits
-            # (we want gap distribution between actual hits)
-            found = False
-            for off in range(1, teimosinha_n + 1):
-                t_idx = base_idx + off
-                if t_idx >= n:
-                    break
-                target = draws[t_idx]
-                k = len(set(plan16.s16) & set(target.bolas))
-                if k >= min_hits:
-                    success_targets.append(t_idx)
-                    success_target_dates.append(target.data)
-                    found = True
-                    break
-            if not found and best_t_idx is not None:
-                # fallback: use best
-                success_targets.append(best_t_idx)
-                success_target_dates.append(best_when)
+            success_targets.append(success_t_idx)
+            success_target_dates.append(draws[success_t_idx].data)
 
     win_rate = (wins / trials) if trials else 0.0
 
@@ -1015,8 +1358,7 @@ def compute_aposta16_gate_stats(
             gaps.append(float((b - a).days))
         gap_now = int((draws[-1].date - dates_sorted[-1]).days) if dates_sorted else int((draws[-1].date - draws[0].date).days)
 
-    p_low = _percentile(gaps, float(gap_percentis[0])) if gaps else 0.0
-    p_high = _percentile(gaps, float(gap_percentis[1])) if gaps else 0.0
+    p_low, p_high = _percentiles(gaps, (float(gap_percentis[0]), float(gap_percentis[1])))
 
     ok = (gap_now >= p_low) and (gap_now <= p_high)
 
@@ -1097,10 +1439,25 @@ def _pct(n: int, d: int) -> float:
 # Engenharia reversa: gerar apostas sugeridas a partir do CSV de repetidos
 # =========================
 
+@functools.lru_cache(maxsize=4096)
 def _try_parse_date_br(s: str) -> Optional[date]:
+    # memoizado: no CSV de repetidos a mesma data de concurso aparece em muitas linhas
+    # (date é imutável, então devolver o mesmo objeto é seguro)
     s = (s or '').strip()
     if not s:
         return None
+    # caminho rápido para o formato do CSV (dd/mm/aaaa, dia/mês com 1-2 dígitos):
+    # split + date() direto; qualquer outra forma cai no strptime como antes
+    parts = s.split('/')
+    if len(parts) == 3:
+        dd, mm, yy = parts
+        if (len(dd) in (1, 2) and len(mm) in (1, 2) and len(yy) == 4
+                and dd.isascii() and mm.isascii() and yy.isascii()
+                and dd.isdigit() and mm.isdigit() and yy.isdigit()):
+            try:
+                return date(int(yy), int(mm), int(dd))
+            except ValueError:
+                return None
     try:
         return datetime.strptime(s, '%d/%m/%Y').date()
     except Exception:
@@ -1111,11 +1468,24 @@ def _parse_semicolon_ints(s: str) -> List[int]:
     s = (s or '').strip()
     if not s:
         return []
+    parts = s.split(';')
+    # caso comum (todos os tokens numéricos): int() já ignora espaços em volta, então uma
+    # passada só; token vazio/inválido => cai no laço tolerante abaixo
+    try:
+        return [int(p) for p in parts]
+    except ValueError:
+        pass
     out: List[int] = []
-    for p in s.split(';'):
-        p = str(p).strip()
+    for p in parts:
+        p = p.strip()
         if not p:
             continue
+        # sinal opcional + dígitos (isdecimal = os mesmos dígitos que int() aceita): sem exceção;
+        # o try fica só para formas raras ("1_000") e lixo de fato
+        digits = p[1:] if p[0] in '+-' else p
+        if digits.isdecimal():
+            out.append(int(p))
+            continue
         try:
             out.append(int(p))
         except ValueError:
@@ -1123,6 +1493,18 @@ def _parse_semicolon_ints(s: str) -> List[int]:
     return out
 
 
+def _csv_int(s: Optional[str], default: int = 0) -> int:
+    """Campo inteiro do CSV: int() direto (caso comum); "12.0" etc. via float; lixo => default."""
+    s = (s or '0').strip()
+    try:
+        return int(s)
+    except ValueError:
+        try:
+            return int(float(s))
+        except Exception:
+            return default
+
+
 def _parse_semicolon_strs(s: str) -> List[str]:
     s = (s or '').strip()
     if not s:
@@ -1130,6 +1512,46 @@ def _parse_semicolon_strs(s: str) -> List[str]:
     return [p.strip() for p in s.split(';') if p.strip()]
 
 
+def _gap_stats(values: List[int]) -> Tuple[List[int], Optional[int], Optional[int], Optional[float]]:
+    """
+    Gaps entre valores consecutivos (já ordenados) + (min, max, média); None sem gaps.
+    Listas curtas (poucas aparições por linha): comprehension + min/max/sum em C bastam.
+    """
+    gaps = [b - a for a, b in zip(values, values[1:])]
+    if not gaps:
+        return gaps, None, None, None
+    return gaps, min(gaps), max(gaps), sum(gaps) / len(gaps)
+
+
+@dataclass(slots=True)
+class CandidateRow:
+    """Linha do CSV de repetidos que passou nos filtros: só o que rank/dedupe precisam."""
+    row: List[str]               # linha original (csv.reader) p/ montar o relatório se escolhida
+    times_generated: int
+    best_hits_today: int
+    sum_payout_today: float
+    gaps_conc: List[int]
+    # freq desc, min_gap asc, avg_gap asc, best_hits desc, payout desc; vazio => 10**9
+    sort_key: Tuple[int, int, float, int, float]
+
+
+# colunas do CSV de repetidos lidas por generate_apostas_from_repetidos
+_REPETIDOS_COLS = (
+    'card', 'nums', 'times_generated', 'origin_target_concurso', 'origin_target_data',
+    'best_hits_today', 'sum_payout_today', 'all_target_concursos', 'all_target_datas',
+)
+
+
+# regex "<prefix>YYYYMMDD_HHMMSS.csv" compilada uma vez por prefixo
+_RX_CACHE: Dict[str, "re.Pattern[str]"] = {}
+
+def _stamped_csv_rx(prefix: str) -> "re.Pattern[str]":
+    rx = _RX_CACHE.get(prefix)
+    if rx is None:
+        rx = re.compile(rf'^{re.escape(prefix)}(?P<d>\d{{8}})_(?P<t>\d{{6}})\.csv$', re.IGNORECASE)
+        _RX_CACHE[prefix] = rx
+    return rx
+
 def _find_latest_repeats_csv(prefix: str = 'simulacao_repetidos_', *, prefer_today: bool = True) -> Optional[str]:
     """Encontra automaticamente o CSV de repetidos mais recente.
 
@@ -1139,7 +1561,32 @@ def _find_latest_repeats_csv(prefix: str = 'simulacao_repetidos_', *, prefer_tod
       2) Se prefer_today=True, tenta priorizar arquivos do dia de hoje (YYYYMMDD).
       3) Se não der para extrair timestamp do nome, cai para o mtime.
     """
-    files = sorted(glob.glob(f'{prefix}*.csv'))
+    # os.scandir: uma listagem só; o mtime (só no fallback) sai do DirEntry, que guarda o stat.
+    # Prefixo com curingas de glob => mantém glob.glob como antes.
+    entries: Dict[str, "os.DirEntry[str]"] = {}
+    if any(ch in prefix for ch in '*?['):
+        files = sorted(glob.glob(f'{prefix}*.csv'))
+    else:
+        dir_part, name_prefix = os.path.split(prefix)
+        want_start = os.path.normcase(name_prefix)
+        want_end = os.path.normcase('.csv')
+        files = []
+        try:
+            with os.scandir(dir_part or '.') as it:
+                for e in it:
+                    name = os.path.normcase(e.name)
+                    if not (name.startswith(want_start) and name.endswith(want_end)):
+                        continue
+                    if e.name.startswith('.') and not name_prefix.startswith('.'):
+                        continue  # glob ignora ocultos
+                    if not e.is_file():
+                        continue
+                    path = os.path.join(dir_part, e.name) if dir_part else e.name
+                    files.append(path)
+                    entries[path] = e
+        except OSError:
+            files = []
+        files.sort()
     if not files:
         return None
 
@@ -1147,7 +1594,7 @@ def _find_latest_repeats_csv(prefix: str = 'simulacao_repetidos_', *, prefer_tod
 
     # tenta usar timestamp do nome do arquivo
     # exemplo esperado: <prefix>20260118_015540.csv
-    rx = re.compile(rf'^{re.escape(prefix)}(?P<d>\d{{8}})_(?P<t>\d{{6}})\.csv$', re.IGNORECASE)
+    rx = _stamped_csv_rx(prefix)
     stamped: List[Tuple[str, str, str]] = []  # (YYYYMMDD, HHMMSS, path)
     for p in files:
         m = rx.match(os.path.basename(p))
@@ -1168,7 +1615,7 @@ def _find_latest_repeats_csv(prefix: str = 'simulacao_repetidos_', *, prefer_tod
         return stamped[0][2]
 
     # fallback: mtime
-    files.sort(key=lambda p: os.path.getmtime(p), reverse=True)
+    files.sort(key=lambda p: entries[p].stat().st_mtime if p in entries else os.path.getmtime(p), reverse=True)
     return files[0]
 
 
@@ -1193,21 +1640,36 @@ def generate_apostas_from_repetidos(
     Observação:
     - Em aposta16 (S16), best_hits_today refere ao k=|S16 ∩ sorteio15| do dia.
     """
-    rows: List[Dict[str, object]] = []
+    # 1a passada: só o necessário para filtrar/rankear/deduplicar (a linha do CSV fica como está);
+    # o dict completo do relatório (gaps em dias etc.) só é montado para as linhas escolhidas
+    cands: List[CandidateRow] = []
 
+    # csv.reader + índice fixo por coluna (sem dict por linha); coluna ausente no cabeçalho
+    # aponta para uma célula vazia extra no fim da linha (mesmo '' que o DictReader daria)
     with open(repetidos_csv, 'r', encoding='utf-8', newline='') as f:
-        r = csv.DictReader(f)
+        r = csv.reader(f)
+        header = next(r, None) or []
+        ncols = len(header)
+        idx = {name: i for i, name in enumerate(header)}
+        pad = any(name not in idx for name in _REPETIDOS_COLS)
+        col = {name: idx.get(name, ncols) for name in _REPETIDOS_COLS}
+        i_times = col['times_generated']
+        i_best = col['best_hits_today']
+        i_pay = col['sum_payout_today']
+        i_concs = col['all_target_concursos']
+
         for row in r:
+            if not row:
+                continue  # linha em branco (DictReader também pula)
+            if len(row) != ncols:
+                row = (row + [''] * ncols)[:ncols]  # linha curta/longa: completa/corta como o DictReader
+            if pad:
+                row.append('')
+
+            times = _csv_int(row[i_times])
+            best_hits = _csv_int(row[i_best])
             try:
-                times = int(float((row.get('times_generated') or '0').strip()))
-            except Exception:
-                times = 0
-            try:
-                best_hits = int(float((row.get('best_hits_today') or '0').strip()))
-            except Exception:
-                best_hits = 0
-            try:
-                sum_pay = float(str(row.get('sum_payout_today') or '0').replace(',', '.'))
+                sum_pay = float((row[i_pay] or '0').replace(',', '.'))
             except Exception:
                 sum_pay = 0.0
 
@@ -1216,75 +1678,73 @@ def generate_apostas_from_repetidos(
             if best_hits < int(min_best_hits_today):
                 continue
 
-            concs = _parse_semicolon_ints(row.get('all_target_concursos') or '')
-            datas = _parse_semicolon_strs(row.get('all_target_datas') or '')
+            concs = _parse_semicolon_ints(row[i_concs])
             concs = sorted(set(concs)) if concs else []
+            gaps_conc, min_gap, _max_gap, avg_gap = _gap_stats(concs)
+
+            # chave de rank com os mesmos valores que iriam pro CSV
+            cands.append(CandidateRow(
+                row=row,
+                times_generated=times,
+                best_hits_today=best_hits,
+                sum_payout_today=sum_pay,
+                gaps_conc=gaps_conc,
+                sort_key=(
+                    -times,
+                    min_gap if min_gap is not None else 10**9,
+                    float(round(avg_gap, 2)) if avg_gap is not None else 10**9,
+                    -best_hits,
+                    -float(round(sum_pay, 2)),
+                ),
+            ))
 
-            gaps_conc: List[int] = []
-            if len(concs) >= 2:
-                for a, b in zip(concs, concs[1:]):
-                    gaps_conc.append(int(b) - int(a))
-
-            min_gap = min(gaps_conc) if gaps_conc else None
-            avg_gap = (sum(gaps_conc) / len(gaps_conc)) if gaps_conc else None
-            max_gap = max(gaps_conc) if gaps_conc else None
-
-            # tenta gaps em dias (se tiver datas válidas)
-            dates = [_try_parse_date_br(d) for d in datas]
-            dates = [d for d in dates if d is not None]
-            gaps_days: List[int] = []
-            if len(dates) >= 2:
-                dates_sorted = sorted(dates)
-                for a, b in zip(dates_sorted, dates_sorted[1:]):
-                    gaps_days.append((b - a).days)
-
-            origin_day = (row.get('origin_target_data') or '').strip()
-
-            rows.append({
-                'card': (row.get('card') or '').strip(),
-                'nums': (row.get('nums') or '').strip(),
-                'times_generated': times,
-                'origin_target_concurso': (row.get('origin_target_concurso') or '').strip(),
-                'origin_target_data': origin_day,
-                'best_hits_today': best_hits,
-                'sum_payout_today': round(sum_pay, 2),
-                'min_gap_concurso': min_gap if min_gap is not None else '',
-                'avg_gap_concurso': round(avg_gap, 2) if avg_gap is not None else '',
-                'max_gap_concurso': max_gap if max_gap is not None else '',
-                'gaps_concurso': ';'.join(str(x) for x in gaps_conc),
-                'min_gap_dias': min(gaps_days) if gaps_days else '',
-                'avg_gap_dias': round(sum(gaps_days) / len(gaps_days), 2) if gaps_days else '',
-                'max_gap_dias': max(gaps_days) if gaps_days else '',
-                'gaps_dias': ';'.join(str(x) for x in gaps_days),
-                'all_target_concursos': (row.get('all_target_concursos') or '').strip(),
-                'all_target_datas': (row.get('all_target_datas') or '').strip(),
-            })
+    def _report_row(c: CandidateRow) -> Dict[str, object]:
+        row = c.row
+        gaps_conc = c.gaps_conc
+        min_gap = min(gaps_conc) if gaps_conc else None
+        avg_gap = (sum(gaps_conc) / len(gaps_conc)) if gaps_conc else None
+        max_gap = max(gaps_conc) if gaps_conc else None
 
-    # rank: freq desc, min_gap asc, avg_gap asc, best_hits desc, payout desc
-    def sort_key(x: Dict[str, object]):
-        times = int(x.get('times_generated') or 0)
-        min_gap = x.get('min_gap_concurso')
-        avg_gap = x.get('avg_gap_concurso')
-        best = int(x.get('best_hits_today') or 0)
-        pay = float(x.get('sum_payout_today') or 0.0)
+        # tenta gaps em dias (se tiver datas válidas): ordinais => mesmos gaps de (b - a).days
+        datas = _parse_semicolon_strs(row[col['all_target_datas']])
+        dates = [_try_parse_date_br(d) for d in datas]
+        ords = sorted(d.toordinal() for d in dates if d is not None)
+        gaps_days, min_days, max_days, avg_days = _gap_stats(ords)
 
-        # normaliza vazios
-        mg = int(min_gap) if str(min_gap).strip() else 10**9
-        ag = float(avg_gap) if str(avg_gap).strip() else 10**9
-        return (-times, mg, ag, -best, -pay)
+        return {
+            'card': row[col['card']].strip(),
+            'nums': row[col['nums']].strip(),
+            'times_generated': c.times_generated,
+            'origin_target_concurso': row[col['origin_target_concurso']].strip(),
+            'origin_target_data': row[col['origin_target_data']].strip(),
+            'best_hits_today': c.best_hits_today,
+            'sum_payout_today': round(c.sum_payout_today, 2),
+            'min_gap_concurso': min_gap if min_gap is not None else '',
+            'avg_gap_concurso': round(avg_gap, 2) if avg_gap is not None else '',
+            'max_gap_concurso': max_gap if max_gap is not None else '',
+            'gaps_concurso': ';'.join(str(x) for x in gaps_conc),
+            'min_gap_dias': min_days if min_days is not None else '',
+            'avg_gap_dias': round(avg_days, 2) if avg_days is not None else '',
+            'max_gap_dias': max_days if max_days is not None else '',
+            'gaps_dias': ';'.join(str(x) for x in gaps_days),
+            'all_target_concursos': row[col['all_target_concursos']].strip(),
+            'all_target_datas': row[col['all_target_datas']].strip(),
+        }
 
-    rows_sorted = sorted(rows, key=sort_key)
+    # rank: freq desc, min_gap asc, avg_gap asc, best_hits desc, payout desc (chaves prontas)
+    cands.sort(key=lambda c: c.sort_key)
 
     # regra: 1 jogo por dia (origin_target_data)
     picked: List[Dict[str, object]] = []
     seen_days: set[str] = set()
-    for r in rows_sorted:
-        day = str(r.get('origin_target_data') or '').strip()
-        key = day if day else f"__nodate__{r.get('nums')}"
+    for c in cands:
+        row = c.row
+        day = row[col['origin_target_data']].strip()
+        key = day if day else f"__nodate__{row[col['nums']].strip()}"
         if key in seen_days:
             continue
         seen_days.add(key)
-        picked.append(r)
+        picked.append(_report_row(c))
         if len(picked) >= int(top_n):
             break
 
@@ -1436,7 +1896,6 @@ def generate_overlap_analysis_for_top(
     if len(draws) < 2:
         return '', []
 
-    concurso_to_idx = {d.concurso: i for i, d in enumerate(draws)}
     last_draw = draws[-1]
     last_result = set(last_draw.bolas)
 
@@ -1473,16 +1932,17 @@ def generate_overlap_analysis_for_top(
 
     for r in top_rows:
         s16 = _parse_nums_str(str(r.get('nums') or ''))
+        s16_mask = to_mask(s16)
         k_last = len(s16 & last_result)
 
         concs = _parse_semicolon_ints(str(r.get('all_target_concursos') or ''))
         ks_at: List[int] = []
         for c in concs:
-            idx = concurso_to_idx.get(int(c))
+            idx = _draw_index(draws, int(c))
             if idx is None or idx <= 0:
                 continue
             base = draws[idx - 1]
-            ks_at.append(len(s16 & set(base.bolas)))
+            ks_at.append((s16_mask & base.mask).bit_count())
 
         pct_8_10 = _pct(sum(1 for x in ks_at if 8 <= x <= 10), len(ks_at))
         pct_eq9 = _pct(sum(1 for x in ks_at if x == 9), len(ks_at))
@@ -1543,7 +2003,7 @@ def generate_overlap_analysis_for_top(
             'hist_avg_k_base': avg_k_at,
             'hist_pct_k_8_10': round(pct_8_10, 2),
             'hist_pct_k_eq9': round(pct_eq9, 2),
-            'novas_no_ultimo': ' '.join(f'{n:02d}' for n in novas),
+            'novas_no_ultimo': _fmt_sorted_nums(novas),
             'novas_top6_score': ' '.join(f'{n:02d}' for n in top6_novas),
             'novas_avg_score': avg_score_novas,
             'grupo_A_10_ult': fmt_list(A),
@@ -1771,7 +2231,9 @@ def simulate_walk_forward(
 
         for card in all_cards:
             nums = set(cards[card])
-            hits = len(nums & current.bolas)
+            nums_str = fmt_list(nums)
+            card_mask = to_mask(nums)
+            hits = (card_mask & current.mask).bit_count()
             if modo == "aposta16":
                 payout = payout_for_aposta16(current, hits) if stats[card].played else 0.0
             else:
@@ -1790,7 +2252,7 @@ def simulate_walk_forward(
 
             total_payout_concurso += payout
 
-            row[f"{card}_nums"] = fmt_list(nums)
+            row[f"{card}_nums"] = nums_str
             row[f"{card}_hits"] = hits
             row[f"{card}_payout"] = round(payout, 2)
             if modo == "aposta16" and card == "S16":
@@ -1798,8 +2260,6 @@ def simulate_walk_forward(
                 for hh in range(11, 16):
                     row[f"S16_count_{hh}"] = int(counts.get(hh, 0))
             # store occurrence for repeats report (card + same 15 numbers)
-            nums_str = fmt_list(nums)
-            card_mask = to_mask(nums)
             key = (card, nums_str)
             occurrences.setdefault(key, []).append({
                 "card": card,
@@ -2500,18 +2960,20 @@ def compute_top6_gate_stats(
         first_ge_min_hit = -1
         first_ge_min_when = None
 
+        # máscaras dos TOP6 (parse uma vez por base, não por concurso futuro)
+        top6_masks = [to_mask(_parse_nums_str(rr.get("nums", ""))) for rr in top6_rows]
+
         # future idxs
         max_j = min(len(draws) - 1, i + teimosinha_n)
         for j in range(i + 1, max_j + 1):
             target = draws[j]
-            target_set = set(target.bolas)
+            target_mask = target.mask
 
             # melhor payout/hit entre os TOP6 neste concurso j
             best_pay_this = 0.0
             best_hit_this = -1
-            for rnk, rr in enumerate(top6_rows, start=1):
-                nums_set = _parse_nums_str(rr.get("nums", ""))
-                k = len(nums_set & target_set)
+            for rnk, (rr, rr_mask) in enumerate(zip(top6_rows, top6_masks), start=1):
+                k = (rr_mask & target_mask).bit_count()
                 pay = _payout(target, k)
 
                 if pay > best_pay_this or (pay == best_pay_this and k > best_hit_this):
@@ -2656,7 +3118,7 @@ def simulate_top6_gate(
     for idx, r in enumerate(rows):
         # --- 1) Simula custo/payout/profit SEM depender do gate (modelo ABCD-like) ---
         base_i = int(r.get("base_index", 0))
-        nums_set = _parse_nums_str(r.get("best_nums", ""))  # conjunto da aposta escolhida (TOP1)
+        nums_mask = to_mask(_parse_nums_str(r.get("best_nums", "")))  # aposta escolhida (TOP1)
 
         # Se atingiu min_hits em algum ponto, pode parar teimosinha no primeiro sucesso (quando houver offset válido)
         stop_at = None
@@ -2677,7 +3139,7 @@ def simulate_top6_gate(
 
         for j in range(base_i + 1, max_j + 1):
             d = draws[j]
-            hits = len(nums_set & set(d.bolas))
+            hits = (nums_mask & d.mask).bit_count()
             contests_played += 1
 
             payout_inc = 0.0
@@ -2723,8 +3185,7 @@ def simulate_top6_gate(
             gaps = [int(b - a) for a, b in zip(win_positions_all, win_positions_all[1:])]
             gap_atual = int(idx - win_positions_all[-1])
             p_low, p_high = float(gate_percentis[0]), float(gate_percentis[1])
-            gate_lo = float(_percentile(gaps, p_low)) if gaps else 0.0
-            gate_hi = float(_percentile(gaps, p_high)) if gaps else 0.0
+            gate_lo, gate_hi = _percentiles(gaps, (p_low, p_high))
             gate_pass = (gap_atual >= gate_lo and gap_atual <= gate_hi)
 
         if win_if_played == 1:
@@ -2903,8 +3364,7 @@ def compute_aposta17_gate_stats(
             success_positions.append(idx_base)
 
     gaps = [b - a for a, b in zip(success_positions, success_positions[1:])]
-    p_low = _percentile(gaps, float(gap_percentis[0])) if gaps else 0.0
-    p_high = _percentile(gaps, float(gap_percentis[1])) if gaps else 0.0
+    p_low, p_high = _percentiles(gaps, (float(gap_percentis[0]), float(gap_percentis[1])))
 
     gap_now = 0
     if success_positions:
@@ -3094,25 +3554,38 @@ def _infer_aposta17_custo(draw: "Draw", fallback15: float = APOSTA15_CUSTO_DEFAU
     """
     return float(_infer_aposta15_custo(draw, fallback=fallback15) * 136.0)
 
-def _build_abcd_games_from_history(history: List[Draw], janela_recente: int = 40, A_por_s16: bool = False, s16_nums: Optional[Set[int]] = None) -> Dict[str, List[int]]:
+def _build_abcd_games_from_history(
+    history: List[Draw],
+    janela_recente: int = 40,
+    A_por_s16: bool = False,
+    s16_nums: Optional[Set[int]] = None,
+    *,
+    freq_rank: Optional[Dict[int, int]] = None,
+    delay_rank: Optional[Dict[int, int]] = None,
+    freq_recent: Optional[Dict[int, int]] = None,
+) -> Dict[str, List[int]]:
     """
     Gera os 4 jogos AB/AC/AD/BCD (15 dezenas) a partir do histórico (walk-forward).
     - Usa a mesma lógica do bloco 'ANALISE COMPLEMENTAR (OVERLAP 8/9/10)'.
     - 'history' deve conter pelo menos 1 concurso.
     - Se A_por_s16=True e s16_nums fornecido, o grupo A é escolhido para maximizar overlap com o S16 (mesma ideia do script).
+    - freq_rank/delay_rank/freq_recent: contagens já calculadas para 'history' (o backtest
+      as mantém incrementalmente); se ausentes, são recalculadas aqui.
     """
     if not history:
         raise ValueError("history vazio para gerar ABCD")
 
     last_draw = history[-1]
     # ranks / grupos baseados no concurso anterior ao alvo
-    delay_rank = _rank_delay(history, window=None)
-    freq_rank  = _rank_frequency(history, window=None)
+    if delay_rank is None:
+        delay_rank = _rank_delay(history, window=None)
+    if freq_rank is None:
+        freq_rank = _rank_frequency(history, window=None)
     # delay_rank e freq_rank podem ser dicts ou listas; normaliza para lista ordenada por score desc
     def _topn(rank_obj, n=10):
         if isinstance(rank_obj, dict):
-            # dict: num -> score (maior melhor)
-            return [k for k, _ in sorted(rank_obj.items(), key=lambda kv: kv[1], reverse=True)[:n]]
+            # dict: num -> score (maior melhor); sort estável => empate fica com o menor número
+            return sorted(rank_obj, key=rank_obj.__getitem__, reverse=True)[:n]
         # lista/tupla de nums
         return list(rank_obj)[:n]
 
@@ -3120,12 +3593,13 @@ def _build_abcd_games_from_history(history: List[Draw], janela_recente: int = 40
     C = set(_topn(freq_rank, 10))    # mais frequentes
 
     # D = 10 mais ausentes nos últimos 'janela_recente' concursos
-    recent = history[-janela_recente:] if len(history) >= janela_recente else history
-    freq_recent: Dict[int, int] = {n: 0 for n in range(1, 26)}
-    for d in recent:
-        for n in d.bolas:
-            freq_recent[n] += 1
-    D = set([n for n, _ in sorted(freq_recent.items(), key=lambda kv: kv[1])[:10]])
+    if freq_recent is None:
+        recent = history[-janela_recente:] if len(history) >= janela_recente else history
+        freq_recent = {n: 0 for n in range(1, 26)}
+        for d in recent:
+            for n in d.bolas:
+                freq_recent[n] += 1
+    D = set(sorted(freq_recent, key=freq_recent.__getitem__)[:10])
 
     # A: grupos (A_global) ou escolhido por S16
     A_global, A_groups = _calc_recent_overlap_stats(history, window=janela_recente)
@@ -3176,6 +3650,118 @@ def _build_abcd_games_from_history(history: List[Draw], janela_recente: int = 40
     }
 
 
+def _abcd_hits_table(games_masks: List[List[int]], draw_masks: List[int], teimosinha_n: int, start: int = 1) -> List[List[List[int]]]:
+    """
+    Acertos dos jogos do dia i (games_masks[i-start], gerados com draws[:i]) em cada um dos
+    'teimosinha_n' concursos seguintes: out[i-start][r][g] = popcount(jogo_g & draws[i+r]).
+    Com numpy, um único AND + popcount vetorizado; sem numpy, int.bit_count().
+    """
+    if not games_masks:
+        return []
+    if np is not None:
+        return _abcd_hits_array(games_masks, draw_masks, teimosinha_n, start).tolist()
+    return [
+        [[(m & draw_masks[i + r]).bit_count() for m in masks] for r in range(teimosinha_n)]
+        for i, masks in enumerate(games_masks, start=start)
+    ]
+
+
+def _abcd_hits_array(games_masks: List[List[int]], draw_masks: List[int], teimosinha_n: int, start: int = 1) -> "np.ndarray":
+    """Versão numpy de _abcd_hits_table: array uint8 (dias, teimosinha_n, jogos)."""
+    g = np.array(games_masks, dtype=np.uint32)                                  # (dias, jogos)
+    d = np.array(draw_masks, dtype=np.uint32)
+    idx = np.arange(start, start + len(games_masks))[:, None] + np.arange(teimosinha_n)[None, :]
+    alvos = d[idx]                                                              # (dias, r)
+    return popcount_u32(alvos[:, :, None] & g[:, None, :])
+
+
+def _abcd_walk_forward_loop(hits, costs, pays, min_hits, start):
+    """
+    Custo/payout da teimosinha de cada dia (mesma ordem de soma do laço em Python):
+    hits[i-start, r, g] = acertos do jogo g no concurso i+r; costs[j] = custo15 do concurso j;
+    pays[j, k] = payout de k acertos no concurso j. win_at = 0 quando não houve prêmio.
+    """
+    n_days = hits.shape[0]
+    total_cost = np.zeros(n_days, dtype=np.float64)
+    total_payout = np.zeros(n_days, dtype=np.float64)
+    best_hits = np.zeros(n_days, dtype=np.int64)
+    win_at = np.zeros(n_days, dtype=np.int64)
+    for d in range(n_days):
+        i = d + start
+        tc = 0.0
+        tp = 0.0
+        bh = 0
+        wa = 0
+        for r in range(hits.shape[1]):
+            tc += 4.0 * costs[i + r]
+            payout_r = 0.0
+            for g in range(hits.shape[2]):
+                k = hits[d, r, g]
+                if k > bh:
+                    bh = k
+                if k >= min_hits:
+                    payout_r += pays[i + r, k]
+            tp += payout_r
+            if wa == 0 and payout_r > 0:
+                wa = r + 1
+        total_cost[d] = tc
+        total_payout[d] = tp
+        best_hits[d] = bh
+        win_at[d] = wa
+    return total_cost, total_payout, best_hits, win_at
+
+
+if np is not None and njit is not None:
+    _abcd_walk_forward_nb = njit(cache=True)(_abcd_walk_forward_loop)
+else:
+    _abcd_walk_forward_nb = None
+
+
+# versão do cálculo por dia do gate ABCD; mudar a lógica => incrementar (invalida caches)
+ABCD_GATE_CACHE_VERSION = 1
+
+
+def _draws_fingerprint(draws: List[Draw]) -> str:
+    """Hash do que o backtest ABCD lê de cada concurso (dezenas, data, prêmios)."""
+    h = hashlib.sha1()
+    for d in draws:
+        h.update(repr((d.concurso, d.mask, str(d.data), sorted(d.premios.items()))).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _load_abcd_gate_cache(path: str, params: Dict[str, Any], draws: List[Draw]) -> List[List[Any]]:
+    """
+    Dias já calculados (custo_total, payout_total, best_hits, win_at) de uma execução
+    anterior, se os parâmetros batem e os concursos que ela usou não mudaram.
+    """
+    try:
+        obj = json.loads(Path(path).read_text(encoding="utf-8"))
+    except Exception:
+        return []
+    n = obj.get("n_draws")
+    if obj.get("params") != params or not isinstance(n, int) or n > len(draws):
+        return []
+    if obj.get("fingerprint") != _draws_fingerprint(draws[:n]):
+        return []
+    return list(obj.get("per_day") or [])
+
+
+def _save_abcd_gate_cache(path: str, params: Dict[str, Any], draws: List[Draw], per_day: List[Any]) -> None:
+    obj = {
+        "params": params,
+        "n_draws": len(draws),
+        "fingerprint": _draws_fingerprint(draws),
+        "per_day": per_day,
+    }
+    try:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path + ".tmp"
+        Path(tmp_path).write_text(json.dumps(obj, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[WARN] Não consegui gravar o cache do gate ABCD em {path}: {e}")
+
+
 def compute_abcd_gate_stats(
     draws: List[Draw],
     janela_recente: int = 40,
@@ -3184,10 +3770,13 @@ def compute_abcd_gate_stats(
     custo15: float = APOSTA15_CUSTO_DEFAULT,
     gate_percentis: Tuple[float, float] = (40.0, 60.0),
     metric: str = "concursos",
+    cache_path: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Backtest walk-forward do ABCD e calcula gate com base em gaps (entre sucessos).
     Sucesso = lucro > 0 dentro de até 'teimosinha_n' concursos jogando os 4 jogos ABCD.
+    cache_path: JSON com os dias já calculados; só os dias novos (ou todos, se os
+    parâmetros/concursos mudaram) são recalculados.
     """
     if metric != "concursos":
         raise ValueError("ABCD gate: metric suportada apenas 'concursos'")
@@ -3197,36 +3786,99 @@ def compute_abcd_gate_stats(
 
     rows: List[Dict[str, Any]] = []
     success_idx: List[int] = []
+    # bitmask por concurso: acertos = popcount(jogo & alvo), sem montar sets
+    draw_masks = [d.mask for d in draws]
+
+    # freq / último índice / freq na janela recente, atualizados a cada passo
+    # (o histórico só ganha draws[i-1]; a janela perde draws[i-1-janela_recente])
+    freq = [0] * 26
+    last_pos = [-1] * 26
+    freq_win = [0] * 26
+    incremental = janela_recente > 0
+    games_masks: List[List[int]] = []
+
+    # (custo_total, payout_total, best_hits, win_at) de cada dia i = 1..; os dias que vêm
+    # do cache não passam de novo pelo gerador de jogos
+    cache_params = {
+        "version": ABCD_GATE_CACHE_VERSION,
+        "janela_recente": janela_recente,
+        "teimosinha_n": teimosinha_n,
+        "min_hits": min_hits,
+        "custo15": custo15,
+    }
+    per_day: List[Tuple[float, float, int, Optional[int]]] = (
+        _load_abcd_gate_cache(cache_path, cache_params, draws) if cache_path else []
+    )
+    start = len(per_day) + 1
 
     # começa em 1 porque precisa de histórico (pelo menos 1 concurso anterior)
     for i in range(1, len(draws) - (teimosinha_n - 1)):
+        if incremental:
+            for n in draws[i - 1].bolas:
+                freq[n] += 1
+                last_pos[n] = i - 1
+                freq_win[n] += 1
+            if i > janela_recente:
+                for n in draws[i - 1 - janela_recente].bolas:
+                    freq_win[n] -= 1
+        if i < start:
+            continue
         history = draws[:i]          # até concurso i-1
-        games = _build_abcd_games_from_history(history, janela_recente=janela_recente)
-
-        total_cost = 0.0  # custo pode variar por concurso (mudança de preço)
-        total_payout = 0.0
-        best_hits = 0
-        win_at = None
-
-        for r in range(teimosinha_n):
-            alvo = draws[i + r]
-            # custo por concurso: 4 apostas (AB/AC/AD/BCD) vezes o custo vigente no concurso
-            custo15_r = _infer_aposta15_custo(alvo, fallback=custo15)
-            total_cost += 4 * custo15_r
-            alvo_set = set(alvo.bolas)
-            # soma payout das 4 apostas
-            payout_r = 0.0
-            best_hits_r = 0
-            for jogo in games.values():
-                k = len(set(jogo) & alvo_set)
-                best_hits_r = max(best_hits_r, k)
-                if k >= min_hits:
-                    payout_r += float(payout_for_hits(alvo, k))
-            total_payout += payout_r
-            best_hits = max(best_hits, best_hits_r)
-            if win_at is None and payout_r > 0:
-                win_at = r + 1
-
+        if incremental:
+            games = _build_abcd_games_from_history(
+                history,
+                janela_recente=janela_recente,
+                freq_rank={n: freq[n] for n in range(1, 26)},
+                delay_rank={n: (i - 1 - last_pos[n]) if last_pos[n] >= 0 else i for n in range(1, 26)},
+                freq_recent={n: freq_win[n] for n in range(1, 26)},
+            )
+        else:
+            games = _build_abcd_games_from_history(history, janela_recente=janela_recente)
+        games_masks.append([to_mask(jogo) for jogo in games.values()])
+
+    if _abcd_walk_forward_nb is not None and games_masks:
+        # caminho compilado: custo15/payouts por concurso em arrays, laço em numba
+        costs = np.array([_infer_aposta15_custo(d, fallback=custo15) for d in draws], dtype=np.float64)
+        pays = np.zeros((len(draws), 16), dtype=np.float64)
+        for j, d in enumerate(draws):
+            for k in range(11, 16):
+                pays[j, k] = payout_for_hits(d, k)
+        hits = _abcd_hits_array(games_masks, draw_masks, teimosinha_n, start)
+        tc, tp, bh, wa = _abcd_walk_forward_nb(hits, costs, pays, int(min_hits), start)
+        per_day += [(c, p, b, w or None) for c, p, b, w in zip(tc.tolist(), tp.tolist(), bh.tolist(), wa.tolist())]
+    else:
+        # acertos de todos os dias novos de uma vez: hits_table[i-start][r][g]
+        hits_table = _abcd_hits_table(games_masks, draw_masks, teimosinha_n, start)
+
+        for i, hits_i in enumerate(hits_table, start=start):
+            total_cost = 0.0  # custo pode variar por concurso (mudança de preço)
+            total_payout = 0.0
+            best_hits = 0
+            win_at = None
+
+            for r in range(teimosinha_n):
+                alvo = draws[i + r]
+                # custo por concurso: 4 apostas (AB/AC/AD/BCD) vezes o custo vigente no concurso
+                custo15_r = _infer_aposta15_custo(alvo, fallback=custo15)
+                total_cost += 4 * custo15_r
+                # soma payout das 4 apostas
+                payout_r = 0.0
+                best_hits_r = 0
+                for k in hits_i[r]:
+                    best_hits_r = max(best_hits_r, k)
+                    if k >= min_hits:
+                        payout_r += float(payout_for_hits(alvo, k))
+                total_payout += payout_r
+                best_hits = max(best_hits, best_hits_r)
+                if win_at is None and payout_r > 0:
+                    win_at = r + 1
+
+            per_day.append((total_cost, total_payout, best_hits, win_at))
+
+    if cache_path and games_masks:
+        _save_abcd_gate_cache(cache_path, cache_params, draws, per_day)
+
+    for i, (total_cost, total_payout, best_hits, win_at) in enumerate(per_day, start=1):
         profit = total_payout - total_cost
         ok = profit > 0.0
 
@@ -3259,8 +3911,7 @@ def compute_abcd_gate_stats(
         }
 
     p_low, p_high = gate_percentis
-    lo = float(_percentile(gaps, p_low))
-    hi = float(_percentile(gaps, p_high))
+    lo, hi = _percentiles(gaps, (p_low, p_high))
 
     # gap atual: desde o último sucesso até o "último dia elegível"
     last_eval_idx = len(draws) - teimosinha_n
@@ -3318,12 +3969,14 @@ def abcd_daily_signal(
     min_hits: int,
     custo15: float,
     gate_percentis: Tuple[float, float],
+    gate_cache: Optional[str] = None,
 ) -> Dict[str, Any]:
     """Calcula o gate (PASS/FAIL) e gera os 4 jogos ABCD para o próximo concurso.
 
     Obs: não roda backtest completo por dia; apenas calcula o gate com a mesma lógica
     do modo --simular_abcd_gate (baseado em gaps entre sucessos no histórico) e gera
     os jogos AB/AC/AD/BCD a partir do histórico mais recente.
+    gate_cache: JSON de cache do backtest (ver compute_abcd_gate_stats).
     """
     stats = compute_abcd_gate_stats(
         draws=draws,
@@ -3333,11 +3986,12 @@ def abcd_daily_signal(
         custo15=custo15,
         gate_percentis=gate_percentis,
         metric="concursos",
+        cache_path=gate_cache,
     )
 
     jogos = _build_abcd_games_from_history(draws, janela_recente=janela_recente)
     # ordena e formata para saída
-    jogos_fmt = {k: _fmt_nums(v) for k, v in jogos.items()}
+    jogos_fmt = {k: _fmt_sorted_nums(v) for k, v in jogos.items()}  # já saem ordenados
 
     # pega contexto do último concurso conhecido
     last = draws[-1] if draws else None
@@ -3354,6 +4008,65 @@ def abcd_daily_signal(
     }
 
 
+def _report_abcd_daily_signal(sig: Dict[str, Any], out_json: Optional[str]) -> None:
+    """Imprime o sinal diário ABCD e (opcional) grava o JSON em out_json."""
+    gate = sig.get("gate", {}) or {}
+    print("\n=== SINAL DIÁRIO ABCD ===")
+    print(f"Último concurso: {sig.get('last_concurso')} | Data: {sig.get('last_data')}")
+    print(f"[GATE ABCD] metric={gate.get('metric','concursos')} | percentis={gate.get('percentis')} | "
+          f"faixa={gate.get('faixa')} conc | gap_atual={gate.get('gap_atual')} conc | PASS={sig.get('gate_pass')}")
+    print("Jogos sugeridos (15 dezenas):")
+    for k in ["AB", "AC", "AD", "BCD"]:
+        if k in sig["jogos"]:
+            print(f"  {k}: {sig['jogos'][k]}")
+    if out_json:
+        try:
+            Path(out_json).write_text(json.dumps(sig, ensure_ascii=False, indent=2), encoding="utf-8")
+            print(f"JSON: {out_json}")
+        except Exception as e:
+            print(f"[WARN] Falha ao gravar JSON em {out_json}: {e}")
+
+
+def daily_signal(
+    teimosinha: int,
+    min_hits: int,
+    gate_percentis: str,
+    out_path: Optional[str] = None,
+    *,
+    resultados_xlsx: Optional[str] = None,
+    aba: Optional[str] = None,
+    janela_recente: int = 40,
+    custo15: float = APOSTA15_CUSTO_DEFAULT,
+    gate_cache: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Equivalente in-process de `--abcd_daily_signal` (usado pelo abcd_runner.py).
+
+    Segue o mesmo fluxo do CLI (XLSX automático, ResultadoNorm, sinal, impressão e
+    JSON opcional) e devolve o sinal no mesmo formato gravado no JSON.
+    """
+    resultados_path = ensure_results_file(resultados_xlsx)
+    draws, sheet_used = read_draws_xlsx(resultados_path, sheet_name=aba)
+    print(f"Resultados XLSX: {resultados_path} | Aba: {sheet_used}")
+    ensure_resultado_norm_column(resultados_path, aba, draws, sheet_used)
+
+    p = _parse_percentiles(gate_percentis, default=(40.0, 60.0))
+    sig = abcd_daily_signal(
+        draws=draws,
+        janela_recente=int(janela_recente),
+        teimosinha_n=int(teimosinha),
+        min_hits=int(min_hits),
+        custo15=float(custo15),
+        gate_percentis=p,
+        gate_cache=gate_cache,
+    )
+    _report_abcd_daily_signal(sig, out_path)
+
+    # tuplas viram listas, como no JSON
+    gate = sig.get("gate", {}) or {}
+    sig["gate"] = {k: list(v) if isinstance(v, tuple) else v for k, v in gate.items()}
+    return sig
+
+
 def simulate_abcd_gate(
     draws: List[Draw],
     janela_recente: int = 40,
@@ -4001,21 +4714,7 @@ def main():
             gate_percentis=p,
         )
 
-        gate = sig.get("gate", {}) or {}
-        print("\n=== SINAL DIÁRIO ABCD ===")
-        print(f"Último concurso: {sig.get('last_concurso')} | Data: {sig.get('last_data')}")
-        print(f"[GATE ABCD] metric={gate.get('metric','concursos')} | percentis={gate.get('percentis')} | "
-              f"faixa={gate.get('faixa')} conc | gap_atual={gate.get('gap_atual')} conc | PASS={sig.get('gate_pass')}")
-        print("Jogos sugeridos (15 dezenas):")
-        for k in ["AB", "AC", "AD", "BCD"]:
-            if k in sig["jogos"]:
-                print(f"  {k}: {sig['jogos'][k]}")
-        if args.abcd_daily_json:
-            try:
-                Path(args.abcd_daily_json).write_text(json.dumps(sig, ensure_ascii=False, indent=2), encoding="utf-8")
-                print(f"JSON: {args.abcd_daily_json}")
-            except Exception as e:
-                print(f"[WARN] Falha ao gravar JSON em {args.abcd_daily_json}: {e}")
+        _report_abcd_daily_signal(sig, args.abcd_daily_json)
         return
 
     if args.simular_abcd_gate: